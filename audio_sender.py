@@ -0,0 +1,226 @@
+"""
+Bounded audio queue and dedicated sender thread between capture and the
+WebSocket.
+
+`Microphone._callback` calls its push callback synchronously, and
+`LiveClient.send` holds `_lock_send` for the whole socket write, so a slow
+network stalls the PortAudio thread until it overflows. AudioSender takes that
+write off the capture thread:
+
+    sender = AudioSender(dg_connection.send)
+    sender.start()
+    microphone = Microphone(sender.push)
+    ...
+    microphone.finish()
+    sender.finish()
+
+`push()` only appends to a queue bounded by `max_bytes`. The sender thread
+takes everything that has piled up, up to `max_send_bytes`, and sends it as a
+single WebSocket frame, so when the network lags the backlog is caught up in a
+few large writes instead of many small ones. When the queue is full the
+`policy` decides: DROP_OLDEST discards the oldest audio so capture never waits
+(live microphones), BLOCK makes `push()` wait for room so nothing is lost
+(file replay as fast as possible).
+
+Text messages such as VoiceGate's KeepAlive keep their position in the stream
+and are sent on their own.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop-oldest"
+BLOCK = "block"
+POLICIES = (DROP_OLDEST, BLOCK)
+
+# 10 s of 16 kHz mono linear16
+DEFAULT_MAX_BYTES = 320000
+DEFAULT_MAX_SEND_BYTES = 32000
+
+
+class AudioSender:
+    """
+    Args:
+        send: called on the sender thread with bytes or str, e.g.
+            `LiveClient.send`.
+        max_bytes: audio that may wait in the queue.
+        max_send_bytes: upper bound for one coalesced frame.
+        policy: DROP_OLDEST or BLOCK, applied when a push does not fit.
+        block_timeout: with BLOCK, seconds a push may wait before the new frame
+            is dropped instead; None waits indefinitely.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Any], Any],
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_send_bytes: int = DEFAULT_MAX_SEND_BYTES,
+        policy: str = DROP_OLDEST,
+        block_timeout: Optional[float] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.send = send
+        self.max_bytes = max_bytes
+        self.max_send_bytes = max_send_bytes
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue: deque = deque()
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+        self.pushed = 0
+        self.sends = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.overflows = 0
+        self.dropped_bytes = 0
+        self.blocked_seconds = 0.0
+        self.depth_max = 0
+        self.bytes_max = 0
+        self.send_seconds_total = 0.0
+        self.send_seconds_max = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audio-sender", daemon=True)
+        self._thread.start()
+
+    def push(self, data) -> bool:
+        """
+        Push callback for a capture source. Returns False if the frame was
+        dropped because the queue was full.
+        """
+        if isinstance(data, str):
+            size = 0
+        else:
+            # sources may hand out reused buffers or mmap slices
+            data = bytes(data)
+            size = len(data)
+        with self._cond:
+            if self._closed:
+                return False
+            self.pushed += 1
+            if size and self._bytes + size > self.max_bytes and not self._make_room(size):
+                return False
+            self._queue.append(data)
+            self._bytes += size
+            self.depth_max = max(self.depth_max, len(self._queue))
+            self.bytes_max = max(self.bytes_max, self._bytes)
+            self._cond.notify_all()
+        return True
+
+    __call__ = push
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def finish(self, timeout: Optional[float] = None) -> bool:
+        """
+        Sends what is queued, then stops the sender thread. Returns False if it
+        did not drain within `timeout` seconds.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        drained = not self._thread.is_alive()
+        self._thread = None
+        return drained
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pushed": self.pushed,
+                "sends": self.sends,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+                "overflows": self.overflows,
+                "dropped_bytes": self.dropped_bytes,
+                "blocked_seconds": self.blocked_seconds,
+                "queue_depth": len(self._queue),
+                "queue_bytes": self._bytes,
+                "queue_depth_max": self.depth_max,
+                "queue_bytes_max": self.bytes_max,
+                "send_latency_avg": self.send_seconds_total / self.sends if self.sends else 0.0,
+                "send_latency_max": self.send_seconds_max,
+            }
+
+    def _make_room(self, size: int) -> bool:
+        # called with the lock held
+        self.overflows += 1
+        if self.policy == BLOCK:
+            started = time.monotonic()
+            fits = self._cond.wait_for(
+                lambda: self._closed or self._bytes + size <= self.max_bytes or not self._bytes,
+                self.block_timeout,
+            )
+            self.blocked_seconds += time.monotonic() - started
+            if fits and not self._closed:
+                return True
+            self.dropped_bytes += size
+            return False
+        while self._queue and self._bytes + size > self.max_bytes:
+            item = self._queue.popleft()
+            if not isinstance(item, str):
+                self._bytes -= len(item)
+                self.dropped_bytes += len(item)
+        return True
+
+    def _next(self):
+        """
+        Waits for the next item and returns it, with consecutive audio frames
+        joined up to `max_send_bytes`. None once closed and drained.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._closed)
+            if not self._queue:
+                return None, 0
+            item = self._queue.popleft()
+            if isinstance(item, str):
+                self._cond.notify_all()
+                return item, 1
+            frames = [item]
+            size = len(item)
+            while (
+                self._queue
+                and not isinstance(self._queue[0], str)
+                and size + len(self._queue[0]) <= self.max_send_bytes
+            ):
+                frame = self._queue.popleft()
+                frames.append(frame)
+                size += len(frame)
+            self._bytes -= size
+            self._cond.notify_all()
+        return (frames[0] if len(frames) == 1 else b"".join(frames)), len(frames)
+
+    def _run(self) -> None:
+        while True:
+            data, frames = self._next()
+            if data is None:
+                return
+            started = time.monotonic()
+            try:
+                ok = self.send(data) is not False
+            except Exception as e:
+                logger.error("audio send failed: %s", e)
+                ok = False
+            took = time.monotonic() - started
+            with self._cond:
+                self.sends += 1
+                self.coalesced += frames - 1
+                self.failed += 0 if ok else 1
+                self.send_seconds_total += took
+                self.send_seconds_max = max(self.send_seconds_max, took)
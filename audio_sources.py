@@ -0,0 +1,242 @@
+"""
+Replayable audio sources with the same contract as `deepgram.Microphone`.
+
+Every source is constructed with a `push_callback`, pushes linear16 audio to it
+from its own thread after `start()`, and stops on `finish()`. File sources read
+through `mmap`, so many streams replaying the same recording share the page
+cache instead of each copying the audio into the heap; frames are handed to the
+callback as `memoryview` slices of the mapping.
+"""
+
+import asyncio
+import inspect
+import logging
+import mmap
+import struct
+import threading
+import time
+from typing import Optional
+
+from deepgram.audio.microphone import CHANNELS, CHUNK, RATE
+
+logger = logging.getLogger(__name__)
+
+# speed value that disables pacing
+AS_FAST_AS_POSSIBLE = 0
+
+
+class AudioSource:
+    """
+    Base class for audio sources. Subclasses implement `_run()`, pushing frames
+    with `self._push(data)` until `self.exit` is set.
+    """
+
+    def __init__(self, push_callback=None):
+        self.push_callback_org = push_callback
+        self.push_callback = None
+        self.exit = threading.Event()
+        self.done = threading.Event()
+        self.asyncio_loop = None
+        self.asyncio_thread = None
+        self._thread = None
+
+    def _start_asyncio_loop(self) -> None:
+        self.asyncio_loop = asyncio.new_event_loop()
+        self.asyncio_loop.run_forever()
+
+    def set_callback(self, push_callback) -> None:
+        self.push_callback_org = push_callback
+
+    def is_active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        if self._thread is not None:
+            logger.error("start() failed. Source already started.")
+            return False
+
+        if inspect.iscoroutinefunction(self.push_callback_org):
+            self.asyncio_thread = threading.Thread(target=self._start_asyncio_loop)
+            self.asyncio_thread.start()
+            while self.asyncio_loop is None:
+                time.sleep(0.001)
+            self.push_callback = lambda data: asyncio.run_coroutine_threadsafe(
+                self.push_callback_org(data), self.asyncio_loop
+            ).result()
+        else:
+            self.push_callback = self.push_callback_org
+
+        self.exit.clear()
+        self.done.clear()
+        self._thread = threading.Thread(target=self._main, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the source has pushed all of its audio.
+        """
+        return self.done.wait(timeout)
+
+    def finish(self) -> bool:
+        self.exit.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        if self.asyncio_thread is not None:
+            self.asyncio_loop.call_soon_threadsafe(self.asyncio_loop.stop)
+            self.asyncio_thread.join()
+            self.asyncio_thread = None
+        self._close()
+        return True
+
+    def _main(self) -> None:
+        try:
+            self._run()
+        except Exception as e:
+            logger.error("%s stopped: %s", type(self).__name__, e)
+        finally:
+            self.done.set()
+
+    def _push(self, data) -> None:
+        self.push_callback(data)
+
+    def _run(self) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class PCMFileSource(AudioSource):
+    """
+    Replays raw little-endian 16-bit PCM from a file.
+
+    Args:
+        path: file to replay.
+        push_callback: receives each frame, e.g. `LiveClient.send`.
+        rate: sample rate of the file.
+        channels: channel count of the file.
+        chunk: frames per push, like `Microphone(chunk=...)`.
+        speed: 1.0 paces at real time, 2.0 at twice real time, and
+            AS_FAST_AS_POSSIBLE (0) pushes without sleeping.
+        loop: restart from the beginning when the end is reached, until finish().
+    """
+
+    sample_width = 2
+
+    def __init__(
+        self,
+        path: str,
+        push_callback=None,
+        rate: int = RATE,
+        channels: int = CHANNELS,
+        chunk: int = CHUNK,
+        speed: float = 1.0,
+        loop: bool = False,
+    ):
+        super().__init__(push_callback)
+        if speed < 0:
+            raise ValueError("speed must not be negative")
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.speed = speed
+        self.loop = loop
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self.data_start, self.data_end = self._locate_data()
+
+    @property
+    def duration(self) -> float:
+        """
+        Length of the audio in seconds.
+        """
+        frame_bytes = self.sample_width * self.channels
+        return (self.data_end - self.data_start) / frame_bytes / self.rate
+
+    def _locate_data(self):
+        return 0, len(self._mmap)
+
+    def _run(self) -> None:
+        step = self.chunk * self.sample_width * self.channels
+        interval = self.chunk / self.rate
+        pushed = 0
+        started = time.monotonic()
+        while not self.exit.is_set():
+            for offset in range(self.data_start, self.data_end, step):
+                if self.exit.is_set():
+                    return
+                if self.speed != AS_FAST_AS_POSSIBLE:
+                    # absolute schedule so sleep jitter does not accumulate
+                    delay = started + pushed * interval / self.speed - time.monotonic()
+                    if delay > 0:
+                        self.exit.wait(delay)
+                self._push(self._view[offset : min(offset + step, self.data_end)])
+                pushed += 1
+            if not self.loop:
+                return
+
+    def _close(self) -> None:
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            # a consumer still holds a slice; the mapping is released with it
+            logger.debug("mmap still referenced, leaving it to the garbage collector")
+        self._file.close()
+
+
+class WavFileSource(PCMFileSource):
+    """
+    Replays the PCM data chunk of a WAV file. Rate and channels come from the
+    file header; only 16-bit PCM is supported since LiveOptions uses linear16.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        push_callback=None,
+        chunk: int = CHUNK,
+        speed: float = 1.0,
+        loop: bool = False,
+    ):
+        super().__init__(path, push_callback, chunk=chunk, speed=speed, loop=loop)
+
+    def _locate_data(self):
+        view = self._mmap
+        if view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+            raise ValueError(f"{self.path} is not a WAV file")
+        offset = 12
+        fmt_seen = False
+        while offset + 8 <= len(view):
+            chunk_id = view[offset : offset + 4]
+            (size,) = struct.unpack_from("<I", view, offset + 4)
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                audio_format, channels, rate, _, _, bits = struct.unpack_from(
+                    "<HHIIHH", view, body
+                )
+                if audio_format != 1 or bits != 16:
+                    raise ValueError(f"{self.path} is not 16-bit PCM")
+                self.channels = channels
+                self.rate = rate
+                fmt_seen = True
+            elif chunk_id == b"data":
+                if not fmt_seen:
+                    raise ValueError(f"{self.path} has no fmt chunk before data")
+                return body, min(body + size, len(view))
+            # chunks are word aligned
+            offset = body + size + (size & 1)
+        raise ValueError(f"{self.path} has no data chunk")
+
+
+def open_audio_file(path: str, push_callback=None, **kwargs) -> PCMFileSource:
+    """
+    Returns a WavFileSource for `.wav` files and a PCMFileSource otherwise.
+    """
+    if path.lower().endswith(".wav"):
+        return WavFileSource(path, push_callback, **kwargs)
+    return PCMFileSource(path, push_callback, **kwargs)
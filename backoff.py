@@ -0,0 +1,17 @@
+"""
+Retry delays shared by the bulk prerecorded runner (bulk_transcribe.py) and the
+live reconnect path (resilient.py).
+
+    for attempt in range(1, max_attempts + 1):
+        ...
+        time.sleep(backoff_delay(attempt, base=0.5, cap=10.0, rng=rng))
+"""
+
+import random
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random) -> float:
+    """
+    Full-jitter exponential backoff for the given 1-based attempt.
+    """
+    return rng.uniform(0, min(cap, base * 2 ** (attempt - 1)))
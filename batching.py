@@ -0,0 +1,140 @@
+"""
+Coalesces NIO message payloads per conversation into list requests.
+
+A conversation's pending batch is flushed when it reaches `max_count` messages,
+`max_bytes` of encoded JSON, or has been open for `max_delay_ms`, whichever
+comes first. Callers force a flush at natural boundaries (speech_final,
+UtteranceEnd, close) with `flush()`.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_COUNT = 20
+DEFAULT_MAX_BYTES = 64 * 1024
+DEFAULT_MAX_DELAY_MS = 250
+
+
+class _Batch:
+    __slots__ = ("payloads", "size", "deadline")
+
+    def __init__(self, deadline: float):
+        self.payloads: List[Dict] = []
+        self.size = 0
+        self.deadline = deadline
+
+
+class MessageBatcher:
+    """
+    Per-conversation batching in front of the NIO message list endpoint.
+
+    Args:
+        flush_fn: called as `flush_fn(payloads, conversation_id)` with the list of
+            buffered payloads. It is called with the batcher lock held so batches
+            for a conversation are handed off in order; it must not block, e.g.
+            `MessageDelivery.submit`.
+        max_count: flush once this many messages are buffered.
+        max_bytes: flush once the buffered payloads reach this many JSON bytes.
+        max_delay_ms: flush a batch this long after its first message arrived.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict], Optional[str]], Any],
+        max_count: int = DEFAULT_MAX_COUNT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_delay_ms: int = DEFAULT_MAX_DELAY_MS,
+    ):
+        self.flush_fn = flush_fn
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay_ms / 1000.0
+        self.messages = 0
+        self.batches = 0
+        self._batches: Dict[Optional[str], _Batch] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._timer = None
+
+    def start(self) -> None:
+        if self._timer is not None:
+            return
+        self._closed = False
+        self._timer = threading.Thread(target=self._run_timer, name="nio-batcher", daemon=True)
+        self._timer.start()
+
+    def add(self, payload: Dict, conversation_id: Optional[str]) -> None:
+        size = len(json.dumps(payload))
+        with self._cond:
+            batch = self._batches.get(conversation_id)
+            if batch is None:
+                batch = _Batch(time.monotonic() + self.max_delay)
+                self._batches[conversation_id] = batch
+                self._cond.notify()
+            batch.payloads.append(payload)
+            batch.size += size
+            self.messages += 1
+            if len(batch.payloads) >= self.max_count or batch.size >= self.max_bytes:
+                self._flush_locked(conversation_id)
+
+    def flush(self, conversation_id: Optional[str]) -> None:
+        with self._cond:
+            self._flush_locked(conversation_id)
+
+    def flush_all(self) -> None:
+        with self._cond:
+            for key in list(self._batches):
+                self._flush_locked(key)
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(batch.payloads) for batch in self._batches.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "messages": self.messages,
+                "batches": self.batches,
+                "pending": sum(len(batch.payloads) for batch in self._batches.values()),
+            }
+
+    def close(self) -> None:
+        """
+        Flush everything and stop the timer thread.
+        """
+        with self._cond:
+            self._closed = True
+            for key in list(self._batches):
+                self._flush_locked(key)
+            self._cond.notify()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+
+    def _flush_locked(self, conversation_id: Optional[str]) -> None:
+        batch = self._batches.pop(conversation_id, None)
+        if batch is None or not batch.payloads:
+            return
+        self.batches += 1
+        try:
+            self.flush_fn(batch.payloads, conversation_id)
+        except Exception as e:
+            logger.error("batch flush failed for %s: %s", conversation_id, e)
+
+    def _run_timer(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                for key, batch in list(self._batches.items()):
+                    if batch.deadline <= now:
+                        self._flush_locked(key)
+                if self._batches:
+                    timeout = min(b.deadline for b in self._batches.values()) - now
+                    self._cond.wait(max(0.0, timeout))
+                else:
+                    self._cond.wait()
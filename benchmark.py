@@ -0,0 +1,269 @@
+"""
+End-to-end latency benchmark, from captured audio frame to NIO message.
+
+Runs microphone.py's threaded pipeline (LiveClient -> TranscriptionSession ->
+MessageBatcher -> MessageDelivery -> NIOClient) against the local fakes in
+fake_deepgram.py and fake_nio.py, with a replayed audio source standing in for
+the microphone. Every stage is measured from the moment the audio frame holding
+the relevant speech was captured:
+
+    frame_sent          LiveClient.send returned for that frame
+    results_received    the Results message covering it reached on_message
+    message_assembled   the transcript line for the selected event was built
+    post_completed      the NIO POST carrying that line returned
+
+Each event-selection mode (speech_final, is_final, utterance_end,
+interim_results) is run separately and reported as p50/p95/p99 in milliseconds.
+
+    python benchmark.py --seconds 30 --dg-latency-ms 150 --nio-p50 20 --nio-p99 200
+"""
+
+import argparse
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from deepgram import DeepgramClient, DeepgramClientOptions
+
+from audio_sources import PCMFileSource
+from batching import MessageBatcher
+from delivery import MessageDelivery
+from fake_deepgram import FakeDeepgramServer
+from fake_nio import FakeNIOServer
+from fast_decode import FastLiveClient
+from microphone import build_live_addons, build_live_options
+from nio import NIOClient
+from session import TranscriptionSession
+
+MODES = ["speech_final", "is_final", "utterance_end", "interim_results"]
+STAGES = ["frame_sent", "results_received", "message_assembled", "post_completed"]
+
+RATE = 16000
+CHUNK_MS = 100
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+    """
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Probe:
+    """
+    Collects per-stage latency samples, keyed back to frame capture times.
+    """
+
+    def __init__(self, chunk_frames: int, rate: int):
+        self.frame_seconds = chunk_frames / rate
+        self.captured: List[float] = []
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def wrap_send(self, send):
+        def push(data):
+            with self._lock:
+                index = len(self.captured)
+                self.captured.append(time.monotonic())
+            send(data)
+            self.record("frame_sent", self.captured[index])
+
+        return push
+
+    def capture_time(self, audio_seconds: float) -> Optional[float]:
+        index = max(0, math.ceil(audio_seconds / self.frame_seconds) - 1)
+        with self._lock:
+            if index >= len(self.captured):
+                return None
+            return self.captured[index]
+
+    def record(self, stage: str, captured: Optional[float]) -> None:
+        if captured is None:
+            return
+        with self._lock:
+            self.samples[stage].append((time.monotonic() - captured) * 1000.0)
+
+    def assembled(self, audio_seconds: float) -> None:
+        captured = self.capture_time(audio_seconds)
+        self.record("message_assembled", captured)
+        with self._lock:
+            self._pending.append(captured)
+
+    def posted(self, count: int) -> None:
+        for _ in range(count):
+            with self._lock:
+                captured = self._pending.popleft() if self._pending else None
+            self.record("post_completed", captured)
+
+    def failed(self, count: int) -> None:
+        # a failed POST completes nothing, but its messages leave the queue
+        with self._lock:
+            for _ in range(min(count, len(self._pending))):
+                self._pending.popleft()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {
+                    "count": len(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                }
+                for stage, values in self.samples.items()
+            }
+
+
+class ProbeSession(TranscriptionSession):
+    """
+    TranscriptionSession that reports stage timings to a Probe.
+    """
+
+    def __init__(self, probe: Probe, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.probe = probe
+        self.audio_end = 0.0
+
+    def print(self, line: str) -> None:
+        pass
+
+    def on_message(self, client, result, **kwargs):
+        self.audio_end = result.start + result.duration
+        self.probe.record("results_received", self.probe.capture_time(self.audio_end))
+        super().on_message(client, result, **kwargs)
+
+    def on_utterance_end(self, client, utterance_end, **kwargs):
+        self.audio_end = utterance_end.last_word_end
+        super().on_utterance_end(client, utterance_end, **kwargs)
+
+    def add_to_conversation(self, event: str, line: str, start: Optional[float] = None) -> None:
+        if self.user_events[event]:
+            self.probe.assembled(self.audio_end)
+        super().add_to_conversation(event, line, start)
+
+
+def run_mode(mode: str, audio_path: str, args) -> Dict[str, Dict[str, float]]:
+    nio_latency = {
+        p: v for p, v in ((50, args.nio_p50), (95, args.nio_p95), (99, args.nio_p99)) if v
+    }
+    # utterance_end only produces messages when endpointing did not fire first
+    speech_final_rate = 0.0 if mode == "utterance_end" else 1.0
+    dg_server = FakeDeepgramServer(
+        latency_ms=args.dg_latency_ms,
+        jitter_ms=args.dg_jitter_ms,
+        speech_final_rate=speech_final_rate,
+    )
+    nio_server = FakeNIOServer(latency_ms=nio_latency, error_rate=args.nio_error_rate)
+    dg_server.start()
+    nio_server.start()
+    try:
+        return _drive(mode, audio_path, args, dg_server.url, nio_server.url)
+    finally:
+        dg_server.stop()
+        nio_server.stop()
+
+
+def _drive(mode: str, audio_path: str, args, dg_url: str, nio_url: str) -> Dict[str, Dict[str, float]]:
+    chunk = RATE * CHUNK_MS // 1000
+    probe = Probe(chunk, RATE)
+    nio = NIOClient(nio_url, "benchmark")
+
+    def add_messages(payloads, conversation_id):
+        response = nio.add_messages(payloads, conversation_id)
+        if response is not None:
+            probe.posted(len(payloads))
+        else:
+            probe.failed(len(payloads))
+        return response
+
+    delivery = MessageDelivery(add_messages)
+    delivery.start()
+    batcher = MessageBatcher(delivery.submit)
+    batcher.start()
+
+    user_events = {event: event == mode for event in MODES}
+    session = ProbeSession(probe, nio, batcher, user_events, name=mode)
+
+    deepgram = DeepgramClient("benchmark", DeepgramClientOptions(url=dg_url))
+    if args.fast_decode:
+        dg_connection = FastLiveClient(deepgram.config)
+    else:
+        dg_connection = deepgram.listen.live.v("1")
+    session.register(dg_connection)
+    if dg_connection.start(build_live_options(args.endpointing), addons=build_live_addons()) is False:
+        raise RuntimeError("could not connect to the fake Deepgram server")
+
+    source = PCMFileSource(
+        audio_path, probe.wrap_send(dg_connection.send), chunk=chunk, speed=args.speed
+    )
+    source.start()
+    source.wait()
+    # give the last results time to arrive before closing
+    time.sleep(args.dg_latency_ms / 1000.0 + 1.5)
+    source.finish()
+    dg_connection.finish()
+    batcher.close()
+    delivery.finish(timeout=30)
+    nio.close()
+    return probe.report()
+
+
+def print_report(results: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    print(f"{'mode':<16} {'stage':<18} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for mode, stages in results.items():
+        for stage, row in stages.items():
+            print(
+                f"{mode:<16} {stage:<18} {row['count']:>6} "
+                f"{row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Frame-to-NIO latency benchmark")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--audio", help="raw 16 kHz linear16 file to replay (default: generated silence)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="length of generated audio")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 1 is real time")
+    parser.add_argument("--endpointing", type=int, default=300)
+    parser.add_argument("--dg-latency-ms", type=float, default=100.0)
+    parser.add_argument("--dg-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--nio-p50", type=float, default=20.0)
+    parser.add_argument("--nio-p95", type=float, default=80.0)
+    parser.add_argument("--nio-p99", type=float, default=200.0)
+    parser.add_argument("--nio-error-rate", type=float, default=0.0)
+    parser.add_argument("--fast-decode", action="store_true", help="receive with fast_decode.FastLiveClient")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    audio_path = args.audio
+    generated = None
+    if audio_path is None:
+        fd, generated = tempfile.mkstemp(suffix=".raw")
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\x00\x00" * int(RATE * args.seconds))
+        audio_path = generated
+
+    try:
+        results = {mode: run_mode(mode, audio_path, args) for mode in args.modes}
+    finally:
+        if generated is not None:
+            os.remove(generated)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
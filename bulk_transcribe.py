@@ -0,0 +1,428 @@
+"""
+Bulk prerecorded transcription for call archives.
+
+Takes a directory of recordings or a manifest, sends every entry to Deepgram's
+prerecorded `v1/listen` endpoint from a bounded thread pool and streams one JSON
+line per entry to the output file:
+
+    {"id": "...", "source": "...", "status": "ok", "attempts": 1, "elapsed": 3.2, "response": {...}}
+
+- Concurrency is bounded by `workers`; all workers share one HTTPPool.
+- Requests are rate limited per API host with a token bucket.
+- 429, 5xx and transport errors are retried with exponential backoff and full
+  jitter.
+- The output file doubles as the checkpoint: on restart, entries already
+  written with status "ok" are skipped, so an interrupted run can be resumed
+  with the same command.
+
+A manifest is either a text file with one path or URL per line, or a `.jsonl`
+file with `{"id": ..., "path": ...}` or `{"id": ..., "url": ...}` objects.
+
+    python bulk_transcribe.py calls/ --out results.jsonl --workers 16 --rate 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+from urllib.parse import urlparse
+
+import httpx
+from deepgram import DeepgramClient, DeepgramClientOptions, PrerecordedOptions
+from deepgram.clients.errors import DeepgramApiError, DeepgramUnknownApiError
+from dotenv import load_dotenv
+
+from backoff import backoff_delay
+from file_upload import FileUpload
+from http_pool import HTTPPool, PooledPreRecordedClient
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm", ".mp4", ".aac", ".raw"}
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+@dataclass
+class Job:
+    id: str
+    path: Optional[str] = None
+    url: Optional[str] = None
+
+    @property
+    def source(self) -> str:
+        return self.url if self.url is not None else self.path
+
+
+def load_jobs(source: str) -> List[Job]:
+    """
+    Builds the job list from a directory (searched recursively for audio files)
+    or a manifest file.
+    """
+    if os.path.isdir(source):
+        jobs = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    jobs.append(Job(id=os.path.relpath(path, source), path=path))
+        return sorted(jobs, key=lambda job: job.id)
+
+    base = os.path.dirname(os.path.abspath(source))
+    jobs = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if source.endswith(".jsonl"):
+                entry = json.loads(line)
+                path = entry.get("path")
+                if path is not None and not os.path.isabs(path):
+                    path = os.path.join(base, path)
+                jobs.append(Job(id=str(entry.get("id") or entry.get("url") or path), path=path, url=entry.get("url")))
+            elif urlparse(line).scheme in ("http", "https"):
+                jobs.append(Job(id=line, url=line))
+            else:
+                path = line if os.path.isabs(line) else os.path.join(base, line)
+                jobs.append(Job(id=line, path=path))
+    return jobs
+
+
+class RateLimiter:
+    """
+    Token bucket: `rate` requests per second with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a token is available. Returns the time spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """
+    One RateLimiter per host, created on first use. A rate of None disables
+    limiting.
+    """
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str) -> float:
+        if not self.rate:
+            return 0.0
+        host = urlparse(url).netloc
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate, self.burst)
+        return limiter.acquire()
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (DeepgramApiError, DeepgramUnknownApiError)):
+        try:
+            return int(e.status) in RETRY_STATUSES
+        except (TypeError, ValueError):
+            return False
+    return isinstance(e, httpx.TransportError)
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """
+    Seconds from the Retry-After header of the response behind an API error
+    (raise_api_error chains the httpx.HTTPStatusError), or None.
+    """
+    cause = e.__cause__ if isinstance(e, (DeepgramApiError, DeepgramUnknownApiError)) else e
+    if not isinstance(cause, httpx.HTTPStatusError):
+        return None
+    value = cause.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def transcribe_raw(
+    client: PooledPreRecordedClient,
+    job: Job,
+    options: Optional[Union[Dict, PrerecordedOptions]] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    endpoint: str = "v1/listen",
+) -> str:
+    """
+    Same request as `transcribe_file`/`transcribe_url`, but returns the
+    response body as a string instead of decoding it into a
+    PrerecordedResponse, since the result is only written back out as JSON.
+    """
+    url = f"{client.config.url}/{endpoint}"
+    if isinstance(options, PrerecordedOptions):
+        options = json.loads(options.to_json())
+    if job.url is not None:
+        return client.post(url, options=options, json={"url": job.url}, timeout=timeout)
+    with FileUpload(job.path) as upload:
+        return client.post(url, options=options, content=upload, timeout=timeout)
+
+
+class ResultWriter:
+    """
+    Thread-safe JSONL writer. Each record is flushed as soon as it is written
+    so the file is a usable checkpoint after a crash.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already written with status "ok". A truncated last line from a crash
+    is ignored.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+class BulkTranscriber:
+    """
+    Runs prerecorded jobs with bounded concurrency, rate limiting, retries and
+    JSONL checkpointing.
+
+    Args:
+        client: PooledPreRecordedClient shared by every worker.
+        out_path: JSONL file results are appended to.
+        options: PrerecordedOptions sent with every request.
+        workers: requests in flight at once.
+        rate: requests per second per API host, None for unlimited.
+        burst: token bucket size, defaults to `rate`.
+        max_attempts: tries per job before it is written as failed.
+        backoff_base: first retry waits up to this many seconds.
+        backoff_cap: upper bound for a single retry wait, unless the response
+            asks for longer with Retry-After.
+        resume: skip jobs already written as "ok" in `out_path`.
+        timeout: per-request timeout; long recordings need a generous read timeout.
+        transcribe: called as `transcribe(client, job, options, timeout)` and
+            must return the response JSON text; defaults to transcribe_raw.
+        cache: ResultCache consulted before, and filled after, each request.
+    """
+
+    def __init__(
+        self,
+        client: PooledPreRecordedClient,
+        out_path: str,
+        options: Optional[Union[Dict, PrerecordedOptions]] = None,
+        workers: int = DEFAULT_WORKERS,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        resume: bool = True,
+        timeout: Optional[httpx.Timeout] = None,
+        transcribe: Callable = transcribe_raw,
+        cache: Optional[ResultCache] = None,
+    ):
+        self.client = client
+        self.out_path = out_path
+        self.options = options
+        self.workers = workers
+        self.limiter = HostRateLimiter(rate, burst)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.resume = resume
+        self.timeout = timeout or httpx.Timeout(600.0, connect=10.0)
+        self.transcribe = transcribe
+        self.cache = cache
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._counts = {"ok": 0, "failed": 0, "skipped": 0, "cached": 0, "retries": 0, "rate_limited": 0.0}
+
+    def _incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counts[name] += value
+
+    def run(self, jobs: Iterable[Job], progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Processes every job and returns the run metrics. `progress` is called
+        with each record after it is written.
+        """
+        done = completed_ids(self.out_path) if self.resume else set()
+        pending = []
+        for job in jobs:
+            if job.id in done:
+                self._incr("skipped")
+            else:
+                pending.append(job)
+
+        started = time.monotonic()
+        writer = ResultWriter(self.out_path)
+        try:
+
+            def work(job: Job) -> None:
+                record = self._run_job(job)
+                writer.write(record)
+                if progress is not None:
+                    progress(record)
+
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                list(pool.map(work, pending))
+        finally:
+            writer.close()
+
+        metrics = self.metrics()
+        metrics["elapsed"] = time.monotonic() - started
+        metrics["jobs_per_second"] = len(pending) / metrics["elapsed"] if metrics["elapsed"] else 0.0
+        return metrics
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return dict(self._counts)
+
+    def _run_job(self, job: Job) -> Dict:
+        started = time.monotonic()
+        record = {"id": job.id, "source": job.source}
+        key = None
+        if self.cache is not None:
+            key = self.cache.key({"url": job.url} if job.url is not None else {"path": job.path}, self.options)
+            raw = self.cache.get(key) if key is not None else None
+            if raw is not None:
+                self._incr("cached")
+                record.update(status="ok", attempts=0, cached=True, response=json.loads(raw))
+                record["elapsed"] = time.monotonic() - started
+                self._incr("ok")
+                return record
+        for attempt in range(1, self.max_attempts + 1):
+            self._incr("rate_limited", self.limiter.acquire(self.client.config.url))
+            try:
+                raw = self.transcribe(self.client, job, self.options, self.timeout)
+                if key is not None:
+                    self.cache.put(key, raw)
+                record.update(status="ok", attempts=attempt, response=json.loads(raw))
+                break
+            except Exception as e:
+                if attempt < self.max_attempts and is_retryable(e):
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, self._rng)
+                    # the server's Retry-After is a lower bound
+                    delay = max(delay, retry_after(e) or 0.0)
+                    logger.warning("%s: attempt %d failed (%s), retrying in %.1fs", job.id, attempt, e, delay)
+                    self._incr("retries")
+                    time.sleep(delay)
+                    continue
+                logger.error("%s: giving up after %d attempts: %s", job.id, attempt, e)
+                record.update(status="failed", attempts=attempt, error=str(e))
+                break
+        record["elapsed"] = time.monotonic() - started
+        self._incr(record["status"])
+        return record
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Transcribe a directory or manifest of recordings")
+    parser.add_argument("input", help="directory of audio files or manifest (.txt / .jsonl)")
+    parser.add_argument("--out", default="results.jsonl", help="JSONL output, also used to resume")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=None, help="max requests per second")
+    parser.add_argument("--burst", type=float, default=None)
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--no-resume", action="store_true", help="do not skip entries already in --out")
+    parser.add_argument("--cache", metavar="DIR", help="reuse results for audio already transcribed with the same options")
+    parser.add_argument("--model", default="nova-2")
+    parser.add_argument("--deepgram-url", default=os.getenv("DEEPGRAM_URL", ""))
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.input)
+    options = PrerecordedOptions(model=args.model, smart_format=True, diarize=True)
+    deepgram = DeepgramClient(os.getenv("DEEPGRAM_API_KEY", ""), DeepgramClientOptions(url=args.deepgram_url))
+
+    with HTTPPool(max_connections=args.workers, max_keepalive_connections=args.workers) as pool:
+        client = PooledPreRecordedClient(deepgram.config, pool)
+        engine = BulkTranscriber(
+            client,
+            args.out,
+            options=options,
+            workers=args.workers,
+            rate=args.rate,
+            burst=args.burst,
+            max_attempts=args.max_attempts,
+            resume=not args.no_resume,
+            cache=ResultCache(args.cache) if args.cache else None,
+        )
+
+        def progress(record):
+            print(f"{record['status']:<6} {record['attempts']} {record['elapsed']:6.1f}s {record['id']}")
+
+        metrics = engine.run(jobs, progress=progress)
+    print(f"Bulk: {metrics}")
+    if engine.cache is not None:
+        print(f"Cache: {engine.cache.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Latency-oriented microphone capture.
+
+`deepgram.Microphone` asks PortAudio for `CHUNK = 8194` frames per callback,
+about 512 ms at 16 kHz, so every word waits half a second in the capture
+buffer before it is even sent. LowLatencyMicrophone sizes the PortAudio buffer
+in milliseconds instead (20, 40, 100 ms ...) and keeps the callback down to a
+copy into a preallocated AudioRing. A sender thread drains the ring at its own
+cadence (`send_ms`, by default one frame) and calls the push callback, so a
+slow `LiveClient.send` never runs on the PortAudio thread.
+
+The callback records the interval between invocations; `metrics()` reports
+the jitter against the nominal frame period along with ring overruns and
+PortAudio input overflows, which is what to look at when choosing the frame
+size for a deployment:
+
+    microphone = LowLatencyMicrophone(dg_connection.send, frame_ms=20)
+    microphone.start()
+    ...
+    microphone.finish()
+    print(microphone.metrics())
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from deepgram.audio.microphone import CHANNELS, RATE
+
+from audio_sources import AudioSource
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRAME_MS = 20
+DEFAULT_BUFFER_MS = 2000
+# callback intervals kept for the percentile figures
+JITTER_SAMPLES = 1000
+
+SAMPLE_WIDTH = 2
+
+
+def frames_for_ms(ms: float, rate: int = RATE) -> int:
+    """
+    Sample frames per buffer of `ms` milliseconds at `rate`.
+    """
+    return max(1, int(rate * ms / 1000))
+
+
+class AudioRing:
+    """
+    Fixed-capacity byte ring between one writer and one reader.
+
+    The buffer is allocated once. `write()` never blocks: when the reader
+    falls behind by more than `capacity` bytes the oldest audio is overwritten
+    and counted in `overruns` / `dropped_bytes`.
+
+    Args:
+        capacity: bytes of audio the ring holds.
+        align: writes and reads keep this byte alignment, e.g. the sample
+            frame size, so an overrun never splits a sample.
+    """
+
+    def __init__(self, capacity: int, align: int = SAMPLE_WIDTH):
+        capacity -= capacity % align
+        if capacity <= 0:
+            raise ValueError("capacity must hold at least one sample frame")
+        self.capacity = capacity
+        self.align = align
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.overruns = 0
+        self.dropped_bytes = 0
+        self.high_water = 0
+
+    def __len__(self) -> int:
+        with self._cond:
+            return self._size
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def write(self, data) -> int:
+        """
+        Copies `data` into the ring. Returns the number of old bytes dropped to
+        make room.
+        """
+        data = memoryview(data).cast("B")
+        if len(data) > self.capacity:
+            data = data[len(data) - self.capacity :]
+        with self._cond:
+            dropped = max(0, self._size + len(data) - self.capacity)
+            if dropped:
+                dropped += -dropped % self.align
+                self._start = (self._start + dropped) % self.capacity
+                self._size -= dropped
+                self.overruns += 1
+                self.dropped_bytes += dropped
+            end = (self._start + self._size) % self.capacity
+            first = min(len(data), self.capacity - end)
+            self._view[end : end + first] = data[:first]
+            self._view[: len(data) - first] = data[first:]
+            self._size += len(data)
+            self.high_water = max(self.high_water, self._size)
+            self._cond.notify()
+        return dropped
+
+    def read(self, size: int, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Waits until `size` bytes are buffered and returns them. After close()
+        the remainder is returned, then None. Also returns None on timeout.
+        """
+        size -= size % self.align
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size >= size or self._closed, timeout):
+                return None
+            if self._size == 0:
+                return None
+            return self._take(min(size, self._size))
+
+    def read_available(self) -> bytes:
+        """
+        Returns whatever is buffered without waiting.
+        """
+        with self._cond:
+            return self._take(self._size)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _take(self, size: int) -> bytes:
+        first = min(size, self.capacity - self._start)
+        data = bytes(self._view[self._start : self._start + first])
+        if first < size:
+            data += bytes(self._view[: size - first])
+        self._start = (self._start + size) % self.capacity
+        self._size -= size
+        return data
+
+
+class CallbackTimer:
+    """
+    Interval statistics for a periodic callback. `tick()` is called on the
+    callback thread; everything else may be called from any thread.
+
+    Args:
+        period: nominal seconds between callbacks.
+    """
+
+    def __init__(self, period: float):
+        self.period = period
+        self.callbacks = 0
+        self.jitter_max = 0.0
+        self._jitter_total = 0.0
+        self._last = None
+        self._intervals: deque = deque(maxlen=JITTER_SAMPLES)
+        self._lock = threading.Lock()
+
+    def tick(self, now: Optional[float] = None) -> None:
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self.callbacks += 1
+            if self._last is not None:
+                interval = now - self._last
+                jitter = abs(interval - self.period)
+                self._intervals.append(interval)
+                self._jitter_total += jitter
+                self.jitter_max = max(self.jitter_max, jitter)
+            self._last = now
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Intervals and jitter in milliseconds. Jitter is the absolute deviation
+        of each interval from the nominal period.
+        """
+        with self._lock:
+            intervals = sorted(self._intervals)
+            measured = self.callbacks - 1 if self.callbacks else 0
+            jitter_avg = self._jitter_total / measured if measured else 0.0
+            jitters = sorted(abs(interval - self.period) for interval in intervals)
+
+        def percentile(values, q):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+        return {
+            "callbacks": self.callbacks,
+            "period_ms": self.period * 1000,
+            "interval_p50_ms": percentile(intervals, 0.5),
+            "interval_max_ms": intervals[-1] * 1000 if intervals else 0.0,
+            "jitter_avg_ms": jitter_avg * 1000,
+            "jitter_p99_ms": percentile(jitters, 0.99),
+            "jitter_max_ms": self.jitter_max * 1000,
+        }
+
+
+class LowLatencyMicrophone(AudioSource):
+    """
+    PyAudio microphone with millisecond frame sizing and a ring buffer between
+    the PortAudio callback and the push callback. Same contract as
+    `deepgram.Microphone`: construct with a push callback, `start()`,
+    `finish()`, `mute()`/`unmute()`.
+
+    Args:
+        push_callback: receives linear16 audio, e.g. `LiveClient.send`.
+        frame_ms: PortAudio buffer length, the capture latency floor.
+        send_ms: audio per push, defaults to `frame_ms`. Larger values trade
+            latency for fewer, larger WebSocket frames.
+        buffer_ms: ring capacity; audio older than this is dropped if the
+            sender stalls.
+        rate: sample rate.
+        channels: input channels.
+        input_device_index: PortAudio device, None for the default input.
+    """
+
+    def __init__(
+        self,
+        push_callback=None,
+        frame_ms: float = DEFAULT_FRAME_MS,
+        send_ms: Optional[float] = None,
+        buffer_ms: float = DEFAULT_BUFFER_MS,
+        rate: int = RATE,
+        channels: int = CHANNELS,
+        input_device_index: Optional[int] = None,
+    ):
+        super().__init__(push_callback)
+        self.rate = rate
+        self.channels = channels
+        self.input_device_index = input_device_index
+        self.frame_ms = frame_ms
+        self.chunk = frames_for_ms(frame_ms, rate)
+        frame_bytes = SAMPLE_WIDTH * channels
+        self.send_bytes = frames_for_ms(send_ms or frame_ms, rate) * frame_bytes
+        self.ring = AudioRing(frames_for_ms(buffer_ms, rate) * frame_bytes, align=frame_bytes)
+        self.timer = CallbackTimer(self.chunk / rate)
+        self.is_muted = False
+        self.input_overflows = 0
+        self.pushed = 0
+        self._silence = bytes(self.chunk * frame_bytes)
+        self._pyaudio = None
+        self._audio = None
+        self.stream = None
+
+    def start(self) -> bool:
+        # imported here like deepgram.Microphone, so the module loads without PortAudio
+        import pyaudio
+
+        if not super().start():
+            return False
+        self._pyaudio = pyaudio
+        try:
+            self._audio = pyaudio.PyAudio()
+            self.stream = self._audio.open(
+                format=pyaudio.paInt16,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                frames_per_buffer=self.chunk,
+                input_device_index=self.input_device_index,
+                stream_callback=self._callback,
+            )
+            self.stream.start_stream()
+        except Exception as e:
+            logger.error("could not open the input device: %s", e)
+            self.finish()
+            return False
+        return True
+
+    def mute(self) -> bool:
+        self.is_muted = True
+        return True
+
+    def unmute(self) -> bool:
+        self.is_muted = False
+        return True
+
+    def _callback(self, input_data, frame_count, time_info, status_flags):
+        # runs on the PortAudio thread: timestamp, copy, return
+        pyaudio = self._pyaudio
+        self.timer.tick()
+        if status_flags & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        if self.exit.is_set():
+            return None, pyaudio.paComplete
+        if input_data is not None:
+            self.capture(self._silence[: len(input_data)] if self.is_muted else input_data)
+        return None, pyaudio.paContinue
+
+    def capture(self, data) -> None:
+        """
+        Hands captured audio to the sender. Called by the PortAudio callback;
+        exposed so other capture backends can feed the same pipeline.
+        """
+        self.ring.write(data)
+
+    def _run(self) -> None:
+        while True:
+            data = self.ring.read(self.send_bytes)
+            if data is None:
+                if self.ring.closed:
+                    return
+                continue
+            self._push(data)
+            self.pushed += 1
+
+    def finish(self) -> bool:
+        self.exit.set()
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+        # the sender drains what was captured, then exits
+        self.ring.close()
+        return super().finish()
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = self.timer.metrics()
+        metrics.update(
+            {
+                "frame_ms": self.frame_ms,
+                "pushed": self.pushed,
+                "input_overflows": self.input_overflows,
+                "ring_overruns": self.ring.overruns,
+                "ring_dropped_bytes": self.ring.dropped_bytes,
+                "ring_high_water_ms": self.ring.high_water / (SAMPLE_WIDTH * self.channels * self.rate) * 1000,
+            }
+        )
+        return metrics
@@ -0,0 +1,270 @@
+"""
+Background delivery of NIO messages so transcript callbacks never wait on HTTP.
+
+Messages are sharded onto a fixed pool of workers by conversation id, so every
+message for a given conversation is delivered by the same worker in the order it
+was submitted, while different conversations are delivered in parallel.
+MessageDelivery uses threads; AsyncMessageDelivery uses tasks on an event loop.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAXSIZE = 1000
+
+_STOP = object()
+
+
+class DeliveryStats:
+    """
+    Thread-safe counters for the delivery pipeline.
+
+    Latencies are in seconds. `queue_latency` is the time a message waited
+    before a worker picked it up, `send_latency` is the time spent in the send
+    function itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.queue_latency_total = 0.0
+        self.queue_latency_max = 0.0
+        self.send_latency_total = 0.0
+        self.send_latency_max = 0.0
+
+    def record_submit(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def record_drop(self) -> None:
+        with self._lock:
+            self.dropped += 1
+
+    def record_result(self, ok: bool, waited: float, took: float) -> None:
+        with self._lock:
+            if ok:
+                self.delivered += 1
+            else:
+                self.failed += 1
+            self.queue_latency_total += waited
+            self.queue_latency_max = max(self.queue_latency_max, waited)
+            self.send_latency_total += took
+            self.send_latency_max = max(self.send_latency_max, took)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.delivered + self.failed
+            return {
+                "submitted": self.submitted,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "queue_latency_avg": (
+                    self.queue_latency_total / completed if completed else 0.0
+                ),
+                "queue_latency_max": self.queue_latency_max,
+                "send_latency_avg": (
+                    self.send_latency_total / completed if completed else 0.0
+                ),
+                "send_latency_max": self.send_latency_max,
+            }
+
+
+class MessageDelivery:
+    """
+    Bounded, ordered-per-conversation delivery pool.
+
+    Args:
+        send: called as `send(payload, conversation_id)` on a worker thread. A
+            return value of None or a raised exception counts as a failure,
+            matching `add_message()` which returns None when the request fails.
+        workers: number of worker threads.
+        maxsize: total number of messages that may be waiting across all workers.
+            `submit()` never blocks; when the pool is full the message is dropped
+            and counted.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict, str], Any],
+        workers: int = DEFAULT_WORKERS,
+        maxsize: int = DEFAULT_MAXSIZE,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.send = send
+        self.stats = DeliveryStats()
+        per_worker = max(1, maxsize // workers)
+        self._queues = [queue.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._threads = []
+        self._started = False
+
+    def start(self) -> None:
+        if self._started:
+            return
+        for index, q in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker, args=(q,), name=f"nio-delivery-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        self._started = True
+
+    def submit(self, payload: Dict, conversation_id: Optional[str]) -> bool:
+        """
+        Queue a message for delivery. Returns False if it was dropped.
+        """
+        self.stats.record_submit()
+        q = self._queues[hash(conversation_id) % len(self._queues)]
+        try:
+            q.put_nowait((payload, conversation_id, time.monotonic()))
+        except queue.Full:
+            self.stats.record_drop()
+            logger.warning("delivery queue full, dropping message for %s", conversation_id)
+            return False
+        return True
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = self.stats.snapshot()
+        metrics["queue_depth"] = self.queue_depth()
+        return metrics
+
+    def finish(self, timeout: Optional[float] = None) -> bool:
+        """
+        Deliver everything already queued, then stop the workers.
+        Returns False if the workers did not drain within `timeout` seconds.
+        """
+        if not self._started:
+            return True
+        for q in self._queues:
+            q.put(_STOP)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+        drained = not any(thread.is_alive() for thread in self._threads)
+        self._threads = []
+        self._started = False
+        return drained
+
+    def _worker(self, q: queue.Queue) -> None:
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            payload, conversation_id, enqueued = item
+            picked = time.monotonic()
+            try:
+                ok = self.send(payload, conversation_id) is not None
+            except Exception as e:
+                logger.error("delivery failed for %s: %s", conversation_id, e)
+                ok = False
+            self.stats.record_result(ok, picked - enqueued, time.monotonic() - picked)
+
+
+class AsyncMessageDelivery:
+    """
+    asyncio counterpart of MessageDelivery; workers are tasks on one event loop.
+
+    Args:
+        send: coroutine function called as `await send(payload, conversation_id)`.
+        workers: number of worker tasks.
+        maxsize: total number of messages that may be waiting across all workers.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict, str], Awaitable[Any]],
+        workers: int = DEFAULT_WORKERS,
+        maxsize: int = DEFAULT_MAXSIZE,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.send = send
+        self.stats = DeliveryStats()
+        self._workers = workers
+        self._per_worker = max(1, maxsize // workers)
+        self._queues = []
+        self._tasks = []
+        self._loop = None
+
+    def start(self) -> None:
+        """
+        Must be called from the event loop the workers should run on.
+        """
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queues = [asyncio.Queue(maxsize=self._per_worker) for _ in range(self._workers)]
+        self._tasks = [self._loop.create_task(self._worker(q)) for q in self._queues]
+
+    def submit(self, payload: Dict, conversation_id: Optional[str]) -> None:
+        """
+        Queue a message for delivery. Safe to call from any thread; calls are
+        handed to the loop in order, so per-conversation ordering holds even when
+        submitters are on different threads (e.g. the MessageBatcher timer).
+        Dropped messages are counted in `stats`.
+        """
+        self.stats.record_submit()
+        self._loop.call_soon_threadsafe(
+            self._enqueue, payload, conversation_id, time.monotonic()
+        )
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = self.stats.snapshot()
+        metrics["queue_depth"] = self.queue_depth()
+        return metrics
+
+    async def finish(self, timeout: Optional[float] = None) -> bool:
+        """
+        Deliver everything already queued, then stop the workers.
+        """
+        if not self._tasks:
+            return True
+        # let any submit() calls scheduled from other threads land first
+        await asyncio.sleep(0)
+        for q in self._queues:
+            await q.put(_STOP)
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+        return not pending
+
+    def _enqueue(self, payload: Dict, conversation_id: Optional[str], enqueued: float) -> None:
+        q = self._queues[hash(conversation_id) % len(self._queues)]
+        try:
+            q.put_nowait((payload, conversation_id, enqueued))
+        except asyncio.QueueFull:
+            self.stats.record_drop()
+            logger.warning("delivery queue full, dropping message for %s", conversation_id)
+
+    async def _worker(self, q: asyncio.Queue) -> None:
+        while True:
+            item = await q.get()
+            if item is _STOP:
+                return
+            payload, conversation_id, enqueued = item
+            picked = time.monotonic()
+            try:
+                ok = await self.send(payload, conversation_id) is not None
+            except Exception as e:
+                logger.error("delivery failed for %s: %s", conversation_id, e)
+                ok = False
+            self.stats.record_result(ok, picked - enqueued, time.monotonic() - picked)
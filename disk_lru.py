@@ -0,0 +1,164 @@
+"""
+Size-bounded LRU index over a directory of cache files, shared by the
+prerecorded result cache and the TTS phrase cache.
+
+Each entry is one file named `<key><suffix>` under a two-character fan-out
+directory. Creation time is kept in the file's mtime and last use in its atime,
+set explicitly so `noatime` mounts do not matter, which lets the LRU order
+survive restarts.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Optional
+
+
+class DiskLRU:
+    """
+    Args:
+        directory: where entries are stored; created if missing.
+        suffix: file extension for entries, e.g. ".json".
+        max_bytes: total size of stored entries before LRU eviction.
+        ttl: seconds an entry stays valid, None to keep until evicted.
+    """
+
+    def __init__(self, directory: str, suffix: str, max_bytes: int, ttl: Optional[float] = None):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        # key -> (size, created), least recently used first
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{self.suffix}")
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._index.get(key)
+            return entry is not None and not self._is_expired(entry[1])
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Path of a live entry, marked as just used, or None on a miss. Expired
+        entries are removed. Counts the hit or miss.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and self._is_expired(entry[1]):
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        path = self.path(key)
+        try:
+            os.utime(path, (time.time(), entry[1]))
+        except FileNotFoundError:
+            self.discard(key)
+            return None
+        return path
+
+    def discard(self, key: str) -> None:
+        """
+        Forgets an entry whose file disappeared after lookup() counted it as a
+        hit, and recounts it as a miss.
+        """
+        with self._lock:
+            self._remove(key)
+            self.hits -= 1
+            self.misses += 1
+
+    def store(self, key: str, write: Callable[[BinaryIO], None]) -> int:
+        """
+        Calls `write(f)` with a temporary file and moves it into place once it
+        returns, so readers never see a partial entry. If `write` raises, the
+        temporary file is removed and nothing is stored. Returns the entry size.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        stat = os.stat(path)
+        with self._lock:
+            self._forget(key)
+            self._index[key] = (stat.st_size, stat.st_mtime)
+            self._bytes += stat.st_size
+            self.stores += 1
+            self._evict()
+        return stat.st_size
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+            }
+
+    def _is_expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _load(self) -> None:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+                if not name.endswith(self.suffix):
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_atime, name[: -len(self.suffix)], stat.st_size, stat.st_mtime))
+        with self._lock:
+            for _, key, size, created in sorted(entries):
+                self._index[key] = (size, created)
+                self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        self._forget(key)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _forget(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[0]
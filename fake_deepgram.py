@@ -0,0 +1,409 @@
+"""
+Local stand-in for Deepgram's live `v1/listen` WebSocket, for offline benchmarks.
+
+The server accepts the LiveOptions query string, consumes linear16 audio and
+replies with scripted `Results`, `SpeechStarted`, `UtteranceEnd` and `Metadata`
+messages. Replies are driven by the audio clock: an event scheduled at 2.0 s of
+audio is released once 2.0 s worth of bytes have arrived, plus the configured
+latency. `KeepAlive` is counted and `CloseStream` flushes, sends Metadata and
+closes, like the real service.
+
+Point a client at it through DeepgramClientOptions:
+
+    server = FakeDeepgramServer()
+    server.start()
+    config = DeepgramClientOptions(url=server.url)
+    deepgram = DeepgramClient("fake-key", config)
+
+or run it standalone with `python fake_deepgram.py --port 8765`.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCRIPT = [
+    "hi I'm calling about the camry I saw on your website",
+    "is it still available",
+    "great can I come in for a test drive on saturday morning",
+    "what would my monthly payment be with five thousand down",
+]
+
+MODEL_INFO = {"name": "fake-nova-2", "version": "0.0.0", "arch": "fake"}
+
+
+class FakeDeepgramServer:
+    """
+    Scripted Deepgram live server.
+
+    Args:
+        host: interface to bind.
+        port: port to bind, 0 picks a free one (see `url` after start()).
+        script: utterances spoken in order, repeated while audio keeps arriving.
+        latency_ms: delay between the audio that triggers a message and sending it.
+        jitter_ms: uniform random extra delay added to `latency_ms`.
+        words_per_second: simulated speaking rate.
+        interim_interval_ms: audio time between interim Results while speaking.
+        final_every_words: split an utterance into is_final segments this long;
+            the last segment carries speech_final.
+        pause_ms: silence between utterances.
+        speech_final_rate: fraction of utterances closed by endpointing with
+            speech_final; the rest only end with UtteranceEnd, as happens in
+            noisy rooms.
+        seed: seed for the jitter and speech_final generators, so runs are
+            repeatable.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        script: Optional[List[str]] = None,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        words_per_second: float = 2.5,
+        interim_interval_ms: int = 250,
+        final_every_words: int = 6,
+        pause_ms: int = 1500,
+        speech_final_rate: float = 1.0,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.script = script or DEFAULT_SCRIPT
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.words_per_second = words_per_second
+        self.interim_interval_ms = interim_interval_ms
+        self.final_every_words = final_every_words
+        self.pause_ms = pause_ms
+        self.speech_final_rate = speech_final_rate
+        self.seed = seed
+        self._random = random.Random(seed)
+
+        self.connections = 0
+        self.audio_bytes = 0
+        self.keepalives = 0
+        self.messages_sent = 0
+        self.last_options: Dict[str, str] = {}
+        self.last_headers: Dict[str, str] = {}
+        self.dropped = 0
+
+        self._active = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        """
+        Runs the server on a background thread and returns its URL.
+        """
+        self._thread = threading.Thread(target=self._run_loop, name="fake-deepgram", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.url
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def drop_connections(self) -> int:
+        """
+        Aborts every open connection without a close handshake, like a network
+        blip; clients see close code 1006. Returns how many were dropped.
+        """
+        if self._loop is None:
+            return 0
+
+        async def drop() -> int:
+            active = list(self._active)
+            for websocket in active:
+                websocket.transport.abort()
+            return len(active)
+
+        dropped = asyncio.run_coroutine_threadsafe(drop(), self._loop).result()
+        self.dropped += dropped
+        return dropped
+
+    def __enter__(self) -> "FakeDeepgramServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    async def serve(self) -> None:
+        """
+        Binds the server on the running loop.
+        """
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def _run_loop(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.serve())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handler(self, websocket) -> None:
+        parsed = urlparse(websocket.path)
+        if parsed.path.rstrip("/") != "/v1/listen":
+            await websocket.close(code=1008, reason="unknown endpoint")
+            return
+
+        options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        self.connections += 1
+        self.last_options = options
+        self.last_headers = dict(websocket.request_headers.raw_items())
+
+        stream = _Stream(self, options)
+        outbox: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.create_task(self._sender(websocket, outbox))
+        self._active.add(websocket)
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    self.audio_bytes += len(message)
+                    for event in stream.feed(len(message)):
+                        outbox.put_nowait((self._due(), event))
+                    continue
+
+                control = json.loads(message)
+                kind = control.get("type")
+                if kind == "KeepAlive":
+                    self.keepalives += 1
+                elif kind == "CloseStream":
+                    for event in stream.flush():
+                        outbox.put_nowait((self._due(), event))
+                    outbox.put_nowait((self._due(), stream.metadata()))
+                    break
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self._active.discard(websocket)
+            outbox.put_nowait(None)
+            await sender
+            await websocket.close()
+
+    async def _sender(self, websocket, outbox: asyncio.Queue) -> None:
+        while True:
+            item = await outbox.get()
+            if item is None:
+                return
+            due, event = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await websocket.send(json.dumps(event))
+                self.messages_sent += 1
+            except websockets.exceptions.ConnectionClosed:
+                return
+
+    def _due(self) -> float:
+        delay = self.latency_ms
+        if self.jitter_ms:
+            delay += self._random.uniform(0, self.jitter_ms)
+        return time.monotonic() + delay / 1000.0
+
+
+class _Stream:
+    """
+    Per-connection audio clock and event timeline.
+    """
+
+    def __init__(self, server: FakeDeepgramServer, options: Dict[str, str]):
+        self.server = server
+        self.options = options
+        self.request_id = str(uuid.uuid4())
+        channels = int(options.get("channels", 1))
+        rate = int(options.get("sample_rate", 16000))
+        self.bytes_per_second = 2 * channels * rate
+        self.received = 0
+        self._timeline = self._events()
+        self._next: Optional[Tuple[float, Dict]] = next(self._timeline)
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.received / self.bytes_per_second
+
+    def feed(self, size: int) -> List[Dict]:
+        self.received += size
+        return self.flush()
+
+    def flush(self) -> List[Dict]:
+        """
+        Releases every event scheduled at or before the audio received so far.
+        """
+        now = self.audio_seconds
+        ready = []
+        while self._next is not None and self._next[0] <= now:
+            ready.append(self._next[1])
+            self._next = next(self._timeline, None)
+        return ready
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "type": "Metadata",
+            "transaction_key": "deprecated",
+            "request_id": self.request_id,
+            "sha256": "",
+            "created": datetime.now(timezone.utc).isoformat(),
+            "duration": self.audio_seconds,
+            "channels": 1,
+            "models": [MODEL_INFO["name"]],
+            "model_info": {MODEL_INFO["name"]: MODEL_INFO},
+        }
+
+    def _events(self) -> Iterator[Tuple[float, Dict]]:
+        server = self.server
+        interim = self.options.get("interim_results") == "true"
+        vad_events = self.options.get("vad_events") == "true"
+        endpointing = float(self.options.get("endpointing", 10)) / 1000.0
+        utterance_end = self.options.get("utterance_end_ms")
+        utterance_end = float(utterance_end) / 1000.0 if utterance_end else None
+        word_duration = 1.0 / server.words_per_second
+        interval = server.interim_interval_ms / 1000.0
+        pause = server.pause_ms / 1000.0
+
+        endpointed = random.Random(server.seed)
+        cursor = 0.0
+        while True:
+            for text in server.script:
+                words = text.split()
+                speech_final = endpointed.random() < server.speech_final_rate
+                events: List[Tuple[float, Dict]] = []
+                if vad_events:
+                    events.append(
+                        (cursor, {"type": "SpeechStarted", "channel": [0, 1], "timestamp": cursor})
+                    )
+
+                timed = [
+                    (word, cursor + i * word_duration, cursor + (i + 1) * word_duration)
+                    for i, word in enumerate(words)
+                ]
+                segments = [
+                    timed[i : i + server.final_every_words]
+                    for i in range(0, len(timed), server.final_every_words)
+                ]
+                for index, segment in enumerate(segments):
+                    seg_start = segment[0][1]
+                    seg_end = segment[-1][2]
+                    if interim:
+                        at = seg_start + interval
+                        while at < seg_end:
+                            heard = [w for w in segment if w[2] <= at]
+                            if heard:
+                                events.append((at, self._result(heard, False, False)))
+                            at += interval
+                    last = index == len(segments) - 1 and speech_final
+                    finalized = seg_end + (endpointing if last else 0)
+                    events.append((finalized, self._result(segment, True, last)))
+
+                end = timed[-1][2]
+                if utterance_end is not None:
+                    events.append(
+                        (
+                            end + utterance_end,
+                            {"type": "UtteranceEnd", "channel": [0, 1], "last_word_end": end},
+                        )
+                    )
+                events.sort(key=lambda event: event[0])
+                yield from events
+                cursor = max(end + pause, events[-1][0])
+
+    def _result(self, words, is_final: bool, speech_final: bool) -> Dict[str, Any]:
+        start = words[0][1]
+        end = words[-1][2]
+        return {
+            "type": "Results",
+            "channel_index": [0, 1],
+            "duration": end - start,
+            "start": start,
+            "is_final": is_final,
+            "speech_final": speech_final,
+            "channel": {
+                "alternatives": [
+                    {
+                        "transcript": " ".join(word for word, _, _ in words),
+                        "confidence": 0.99,
+                        "words": [
+                            {
+                                "word": word,
+                                "start": word_start,
+                                "end": word_end,
+                                "confidence": 0.99,
+                                "punctuated_word": word,
+                                "speaker": 0,
+                            }
+                            for word, word_start, word_end in words
+                        ],
+                    }
+                ]
+            },
+            "metadata": {
+                "request_id": self.request_id,
+                "model_info": MODEL_INFO,
+                "model_uuid": "00000000-0000-0000-0000-000000000000",
+            },
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Deepgram live transcription server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--words-per-second", type=float, default=2.5)
+    parser.add_argument("--interim-interval-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    server = FakeDeepgramServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        words_per_second=args.words_per_second,
+        interim_interval_ms=args.interim_interval_ms,
+    )
+
+    async def run():
+        await server.serve()
+        print(f"Fake Deepgram listening on {server.url}")
+        await asyncio.Future()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Local stand-in for the NIO sandbox, for measuring how the transcript pipeline
+behaves when the CRM backend is slow or failing.
+
+Serves `POST /v2/conversations` and `POST /v2/messagelist/{id}`, records every
+request it receives and can inject:
+
+- response latency drawn from configured p50/p95/p99 values,
+- 5xx responses, either at a random rate or exactly the next N requests,
+- a slow reader that drains request bodies at a fixed byte rate.
+
+Message posts carrying an `Idempotency-Key` already seen are answered with the
+first reply and not stored again, like the real API.
+
+Run it on a background thread:
+
+    server = FakeNIOServer(latency_ms={50: 20, 95: 80, 99: 200}, error_rate=0.01)
+    server.start()
+    nio = NIOClient(server.url, "fake-key")
+
+or standalone with `python fake_nio.py --port 8080`, then set NIO_SBX_URL.
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RecordedRequest:
+    path: str
+    body: Any
+    headers: Dict[str, str]
+    status: int
+    received_at: float
+    conversation_id: Optional[str] = None
+    latency: float = 0.0
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Latency distribution given as percentiles in milliseconds, e.g.
+    `{50: 20, 95: 80, 99: 200}`. Samples are interpolated linearly between the
+    given points, with 0 ms at p0 and the highest value held up to p100.
+    """
+
+    percentiles: Dict[float, float] = field(default_factory=dict)
+
+    def sample(self, rng: random.Random) -> float:
+        if not self.percentiles:
+            return 0.0
+        points = [(0.0, 0.0)] + sorted(self.percentiles.items())
+        q = rng.uniform(0, 100)
+        for (p0, v0), (p1, v1) in zip(points, points[1:]):
+            if q <= p1:
+                return v0 + (v1 - v0) * (q - p0) / (p1 - p0)
+        return points[-1][1]
+
+
+class FakeNIOServer:
+    """
+    Recording NIO sandbox with latency and failure injection.
+
+    Args:
+        host: interface to bind.
+        port: port to bind, 0 picks a free one (see `url` after start()).
+        latency_ms: `{percentile: milliseconds}` response latency.
+        error_rate: fraction of requests answered with `error_status`.
+        error_status: status code used for injected failures.
+        slow_read_bps: if set, request bodies are read at this many bytes/second.
+        api_key: if set, requests without this `X-API-Key` get a 401.
+        seed: seed for latency and error sampling, so runs are repeatable.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: Optional[Dict[float, float]] = None,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        slow_read_bps: Optional[int] = None,
+        api_key: Optional[str] = None,
+        seed: int = 0,
+    ):
+        self.latency = LatencyProfile(latency_ms or {})
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_read_bps = slow_read_bps
+        self.api_key = api_key
+        self.requests: List[RecordedRequest] = []
+        self.conversations: Dict[str, List[Dict]] = {}
+        self.duplicates = 0
+        self._replies: Dict[str, Dict] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fail_next = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-nio", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeNIOServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def fail_next(self, count: int = 1) -> None:
+        """
+        Answer the next `count` requests with `error_status`, regardless of
+        `error_rate`.
+        """
+        with self._lock:
+            self._fail_next += count
+
+    def messages(self, conversation_id: str) -> List[Dict]:
+        """
+        Messages accepted for a conversation, in arrival order.
+        """
+        with self._lock:
+            return list(self.conversations.get(conversation_id, []))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.conversations.clear()
+            self._replies.clear()
+            self.duplicates = 0
+            self._fail_next = 0
+
+    def _decide(self) -> tuple:
+        with self._lock:
+            delay = self.latency.sample(self._rng) / 1000.0
+            if self._fail_next > 0:
+                self._fail_next -= 1
+                return delay, True
+            return delay, self._rng.random() < self.error_rate
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        received_at = time.monotonic()
+        body = self._read_body(request)
+        headers = dict(request.headers.items())
+        path = request.path.split("?", 1)[0]
+        delay, fail = self._decide()
+        if delay:
+            time.sleep(delay)
+
+        conversation_id = None
+        if self.api_key is not None and headers.get("X-API-Key") != self.api_key:
+            status, reply = 401, {"message": "Unauthorized"}
+        elif fail:
+            status, reply = self.error_status, {"message": "injected failure"}
+        elif path == "/v2/conversations":
+            conversation_id = str(uuid.uuid4())
+            with self._lock:
+                self.conversations[conversation_id] = []
+            status, reply = 201, {"id": conversation_id, **(body or {})}
+        elif path.startswith("/v2/messagelist/"):
+            conversation_id = path[len("/v2/messagelist/"):]
+            messages = body if isinstance(body, list) else [body]
+            key = headers.get("Idempotency-Key")
+            with self._lock:
+                reply = self._replies.get(key) if key else None
+                if reply is not None:
+                    self.duplicates += 1
+                else:
+                    self.conversations.setdefault(conversation_id, []).extend(messages)
+                    reply = {"conversationId": conversation_id, "count": len(messages)}
+                    if key:
+                        self._replies[key] = reply
+            status = 201
+        else:
+            status, reply = 404, {"message": "Not Found"}
+
+        with self._lock:
+            self.requests.append(
+                RecordedRequest(
+                    path=path,
+                    body=body,
+                    headers=headers,
+                    status=status,
+                    received_at=received_at,
+                    conversation_id=conversation_id,
+                    latency=time.monotonic() - received_at,
+                )
+            )
+
+        data = json.dumps(reply).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _read_body(self, request: BaseHTTPRequestHandler) -> Any:
+        length = int(request.headers.get("Content-Length", 0))
+        if self.slow_read_bps:
+            chunk = max(1, self.slow_read_bps // 10)
+            parts = []
+            remaining = length
+            while remaining > 0:
+                part = request.rfile.read(min(chunk, remaining))
+                if not part:
+                    break
+                parts.append(part)
+                remaining -= len(part)
+                time.sleep(len(part) / self.slow_read_bps)
+            raw = b"".join(parts)
+        else:
+            raw = request.rfile.read(length)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return raw.decode(errors="replace")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake NIO sandbox server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--p50", type=float, default=0, help="median latency in ms")
+    parser.add_argument("--p95", type=float, default=0, help="95th percentile latency in ms")
+    parser.add_argument("--p99", type=float, default=0, help="99th percentile latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--slow-read-bps", type=int, default=None)
+    args = parser.parse_args()
+
+    latency = {p: v for p, v in ((50, args.p50), (95, args.p95), (99, args.p99)) if v}
+    server = FakeNIOServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        slow_read_bps=args.slow_read_bps,
+    )
+    print(f"Fake NIO listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
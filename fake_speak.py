@@ -0,0 +1,207 @@
+"""
+Local stand-in for Deepgram's `v1/speak` endpoint, for measuring TTS latency
+without the network.
+
+Each request is answered like the real service: the Deepgram headers come
+first, and then, after `first_byte_ms` plus `ms_per_char` for each input
+character, the audio is streamed chunked at `bytes_per_second`. The audio is
+`bytes_per_char` bytes per input character and derived from the text, so a
+client that reassembles several responses can check the order.
+
+    server = FakeSpeakServer(first_byte_ms=150, bytes_per_second=48000)
+    server.start()
+    deepgram = DeepgramClient("fake-key", DeepgramClientOptions(url=server.url))
+
+or standalone with `python fake_speak.py --port 8766`.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 4096
+
+
+def synthesize(text: str, bytes_per_char: int) -> bytes:
+    """
+    The fake audio for `text`: a repeated digest of the text, so equal texts
+    give equal audio and different texts differ.
+    """
+    seed = hashlib.sha256(text.encode()).digest()
+    length = max(1, len(text)) * bytes_per_char
+    return (seed * (length // len(seed) + 1))[:length]
+
+
+class FakeSpeakServer:
+    """
+    Streaming TTS server.
+
+    Args:
+        host: interface to bind.
+        port: port to bind, 0 picks a free one (see `url` after start()).
+        first_byte_ms: delay between the request and the first audio byte.
+        ms_per_char: extra first-byte delay per input character, since longer
+            texts take longer to start.
+        bytes_per_second: streaming rate of the audio body, 0 for unthrottled.
+        bytes_per_char: audio produced per input character.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        first_byte_ms: float = 150,
+        ms_per_char: float = 0,
+        bytes_per_second: int = 48000,
+        bytes_per_char: int = 800,
+    ):
+        self.first_byte_ms = first_byte_ms
+        self.ms_per_char = ms_per_char
+        self.bytes_per_second = bytes_per_second
+        self.bytes_per_char = bytes_per_char
+        self.requests: List[Dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-speak", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeSpeakServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        parsed = urlparse(request.path)
+        length = int(request.headers.get("Content-Length", 0))
+        body = json.loads(request.rfile.read(length) or b"{}")
+        if parsed.path.rstrip("/") != "/v1/speak" or "text" not in body:
+            self._reply_json(request, 400, {"err_code": "Bad Request", "err_msg": "text is required"})
+            return
+
+        options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        text = body["text"]
+        with self._lock:
+            self.requests.append({"text": text, "options": options, "received_at": time.monotonic()})
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            self._stream(request, text, options)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading, e.g. an abandoned pipelined sentence
+            logger.debug("client went away during %r", text[:40])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _stream(self, request: BaseHTTPRequestHandler, text: str, options: Dict[str, str]) -> None:
+        model = options.get("model", "aura-asteria-en")
+        request.send_response(200)
+        request.send_header("Content-Type", "audio/mpeg")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.send_header("dg-request-id", str(uuid.uuid4()))
+        request.send_header("dg-model-name", model)
+        request.send_header("dg-model-uuid", "00000000-0000-0000-0000-000000000000")
+        request.send_header("dg-char-count", str(len(text)))
+        request.send_header("date", datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT"))
+        request.end_headers()
+        request.wfile.flush()
+
+        time.sleep((self.first_byte_ms + self.ms_per_char * len(text)) / 1000.0)
+        audio = synthesize(text, self.bytes_per_char)
+        started = time.monotonic()
+        for offset in range(0, len(audio), CHUNK_SIZE):
+            chunk = audio[offset : offset + CHUNK_SIZE]
+            if self.bytes_per_second:
+                due = started + offset / self.bytes_per_second
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            request.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            request.wfile.flush()
+        request.wfile.write(b"0\r\n\r\n")
+        request.wfile.flush()
+
+    def _reply_json(self, request: BaseHTTPRequestHandler, status: int, reply: Dict) -> None:
+        data = json.dumps(reply).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Deepgram text-to-speech server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--first-byte-ms", type=float, default=150)
+    parser.add_argument("--ms-per-char", type=float, default=0)
+    parser.add_argument("--bytes-per-second", type=int, default=48000)
+    parser.add_argument("--bytes-per-char", type=int, default=800)
+    args = parser.parse_args()
+
+    server = FakeSpeakServer(
+        host=args.host,
+        port=args.port,
+        first_byte_ms=args.first_byte_ms,
+        ms_per_char=args.ms_per_char,
+        bytes_per_second=args.bytes_per_second,
+        bytes_per_char=args.bytes_per_char,
+    )
+    print(f"Fake speak listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Fast-path decoding of live transcription messages.
+
+`LiveClient._listening` parses every message twice (`json.loads` to read the
+type, then `LiveResultResponse.from_json`) and builds the nested
+Channel/Alternative/Word dataclasses through dataclasses_json's reflective
+decoder. FastLiveClient parses each message once and turns `Results` into small
+`__slots__` objects exposing the attributes TranscriptionSession reads.
+Words are only built when indexed, so reading the first word's speaker does
+not decode the rest of the utterance.
+
+    dg_connection = FastLiveClient(deepgram.config)
+
+FastLiveClient is a drop-in LiveClient: events, handler signatures and error
+handling are unchanged, only the `result` object type differs.
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Sequence
+from typing import Any, Dict, List, Optional
+
+import websockets
+from deepgram import LiveClient, LiveResultResponse, LiveTranscriptionEvents
+from deepgram.clients.live.v1.response import (
+    CloseResponse,
+    ErrorResponse,
+    MetadataResponse,
+    OpenResponse,
+    SpeechStartedResponse,
+    UnhandledResponse,
+    UtteranceEndResponse,
+)
+
+
+class FastWord:
+    __slots__ = ("word", "start", "end", "confidence", "punctuated_word", "speaker")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.word = raw.get("word", "")
+        self.start = raw.get("start", 0)
+        self.end = raw.get("end", 0)
+        self.confidence = raw.get("confidence", 0)
+        self.punctuated_word = raw.get("punctuated_word")
+        self.speaker = raw.get("speaker")
+
+
+class FastWords(Sequence):
+    """
+    Read-only list of words that builds a FastWord only for the index asked
+    for, so `words[0].speaker` does not pay for the rest of the utterance.
+    """
+
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw: List[Dict[str, Any]]):
+        self._raw = raw
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [FastWord(word) for word in self._raw[index]]
+        return FastWord(self._raw[index])
+
+
+class FastAlternative:
+    __slots__ = ("transcript", "confidence", "words")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.transcript = raw.get("transcript", "")
+        self.confidence = raw.get("confidence", 0)
+        words = raw.get("words")
+        self.words = FastWords(words) if words is not None else None
+
+
+class FastChannel:
+    __slots__ = ("alternatives",)
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.alternatives = [FastAlternative(alt) for alt in raw.get("alternatives") or ()]
+
+
+class FastResult:
+    """
+    Results message with the same attribute paths as LiveResultResponse
+    (`result.channel.alternatives[0].transcript`, `result.is_final`, ...).
+    The parsed JSON is kept in `raw`.
+    """
+
+    __slots__ = (
+        "type",
+        "channel_index",
+        "duration",
+        "start",
+        "is_final",
+        "speech_final",
+        "channel",
+        "raw",
+    )
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.type = raw.get("type", "")
+        self.channel_index = raw.get("channel_index")
+        self.duration = raw.get("duration", 0)
+        self.start = raw.get("start", 0)
+        self.is_final = raw.get("is_final", False)
+        self.speech_final = raw.get("speech_final", False)
+        self.channel = FastChannel(raw.get("channel") or {})
+        self.raw = raw
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self.raw.get("metadata")
+
+    def __getitem__(self, key):
+        return self.raw[key]
+
+    def __str__(self) -> str:
+        return json.dumps(self.raw, indent=4)
+
+
+_EVENTS = {
+    LiveTranscriptionEvents.Open.value: (LiveTranscriptionEvents.Open, "open", OpenResponse),
+    LiveTranscriptionEvents.Metadata.value: (
+        LiveTranscriptionEvents.Metadata,
+        "metadata",
+        MetadataResponse,
+    ),
+    LiveTranscriptionEvents.SpeechStarted.value: (
+        LiveTranscriptionEvents.SpeechStarted,
+        "speech_started",
+        SpeechStartedResponse,
+    ),
+    LiveTranscriptionEvents.UtteranceEnd.value: (
+        LiveTranscriptionEvents.UtteranceEnd,
+        "utterance_end",
+        UtteranceEndResponse,
+    ),
+    LiveTranscriptionEvents.Close.value: (LiveTranscriptionEvents.Close, "close", CloseResponse),
+    LiveTranscriptionEvents.Error.value: (LiveTranscriptionEvents.Error, "error", ErrorResponse),
+}
+
+
+class FastLiveClient(LiveClient):
+    """
+    LiveClient whose receive loop decodes each message exactly once.
+    """
+
+    def _listening(self) -> None:
+        self.logger.debug("FastLiveClient._listening ENTER")
+        transcript = LiveTranscriptionEvents.Transcript.value
+
+        while True:
+            try:
+                if self._exit_event.is_set():
+                    self.logger.notice("_listening exiting gracefully")
+                    self.logger.debug("FastLiveClient._listening LEAVE")
+                    return
+
+                if self._socket is None:
+                    self.logger.warning("socket is empty")
+                    self.logger.debug("FastLiveClient._listening LEAVE")
+                    return
+
+                message = self._socket.recv()
+                if message is None:
+                    continue
+
+                data = json.loads(message)
+                response_type = data.get("type")
+
+                if response_type == transcript:
+                    self._emit(
+                        LiveTranscriptionEvents.Transcript,
+                        result=FastResult(data),
+                        **dict(self.kwargs),
+                    )
+                    continue
+
+                known = _EVENTS.get(response_type)
+                if known is not None:
+                    event, name, response_class = known
+                    self._emit(event, **{name: response_class.from_dict(data)}, **dict(self.kwargs))
+                    continue
+
+                self.logger.warning(
+                    "Unknown Message: response_type: %s, data: %s", response_type, data
+                )
+                self._emit(
+                    LiveTranscriptionEvents.Unhandled,
+                    unhandled=UnhandledResponse(
+                        type=LiveTranscriptionEvents.Unhandled.value, raw=message
+                    ),
+                    **dict(self.kwargs),
+                )
+
+            except websockets.exceptions.ConnectionClosedOK as e:
+                self.logger.notice(f"_listening({e.code}) exiting gracefully")
+                self.logger.debug("FastLiveClient._listening LEAVE")
+                return
+
+            except websockets.exceptions.WebSocketException as e:
+                if e.code == 1000:
+                    self.logger.notice(f"_listening({e.code}) exiting gracefully")
+                    self.logger.debug("FastLiveClient._listening LEAVE")
+                    return
+                self._fail("WebSocketException in FastLiveClient._listening", e)
+                if self.config.options.get("termination_exception") == "true":
+                    raise
+                return
+
+            except Exception as e:
+                self._fail("Exception in FastLiveClient._listening", e)
+                if self.config.options.get("termination_exception") == "true":
+                    raise
+                return
+
+    def _fail(self, description: str, e: Exception) -> None:
+        self.logger.error("%s: %s", description, e)
+        error: ErrorResponse = {
+            "type": "Exception",
+            "description": description,
+            "message": f"{e}",
+            "variant": "",
+        }
+        self._emit(LiveTranscriptionEvents.Error, error)
+
+        # signal exit and close
+        self._signal_exit()
+
+        self.logger.debug("FastLiveClient._listening LEAVE")
+
+
+def sample_results(words: int = 12) -> str:
+    """
+    A Results message shaped like the ones diarized nova-2 streams return.
+    """
+    return json.dumps(
+        {
+            "type": "Results",
+            "channel_index": [0, 1],
+            "duration": words * 0.4,
+            "start": 12.5,
+            "is_final": True,
+            "speech_final": True,
+            "channel": {
+                "alternatives": [
+                    {
+                        "transcript": " ".join(f"word{i}" for i in range(words)),
+                        "confidence": 0.99,
+                        "words": [
+                            {
+                                "word": f"word{i}",
+                                "start": 12.5 + i * 0.4,
+                                "end": 12.9 + i * 0.4,
+                                "confidence": 0.99,
+                                "punctuated_word": f"Word{i}",
+                                "speaker": 0,
+                                "speaker_confidence": 0.8,
+                            }
+                            for i in range(words)
+                        ],
+                    }
+                ]
+            },
+            "metadata": {
+                "request_id": "00000000-0000-0000-0000-000000000000",
+                "model_info": {"name": "2-automotive-nova", "version": "2024-01-01", "arch": "nova-2"},
+                "model_uuid": "00000000-0000-0000-0000-000000000000",
+            },
+            "from_finalize": False,
+        }
+    )
+
+
+def _sdk_decode(message: str):
+    # what LiveClient._listening does for every Results message
+    json.loads(message)
+    return LiveResultResponse.from_json(message)
+
+
+def _fast_decode(message: str):
+    return FastResult(json.loads(message))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare SDK and fast-path Results decoding")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=12, help="words per Results message")
+    args = parser.parse_args()
+
+    message = sample_results(args.words)
+    timings = {}
+    for name, decode in (("sdk", _sdk_decode), ("fast", _fast_decode)):
+        started = time.process_time()
+        for _ in range(args.messages):
+            result = decode(message)
+            alternative = result.channel.alternatives[0]
+            alternative.transcript, result.is_final, result.speech_final
+            alternative.words[0].speaker
+        timings[name] = (time.process_time() - started) / args.messages * 1e6
+        print(f"{name:<5} {timings[name]:>8.1f} us/message")
+    print(f"speedup {timings['sdk'] / timings['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Streaming request bodies for prerecorded uploads.
+
+`transcribe_file` with a BufferSource needs the whole recording in memory.
+FileUpload instead streams the file from disk in fixed-size chunks, through a
+buffer that is reused for the whole upload, or from an mmap. It reports upload
+progress as it goes, and peak memory stays flat whatever the file size:
+
+    upload = FileUpload("call.wav", progress=lambda sent, total: print(sent, total))
+    response = prerecorded.transcribe_file({"stream": upload}, options)
+
+The file stays open until `close()` (or the end of a `with` block). httpx
+sends a FileUpload with a Content-Length header, taken from `fileno()`. Every
+iteration starts from the beginning of the file, so the same object can be
+sent again on retry. Use AsyncFileUpload with AsyncPreRecordedClient; async
+bodies are sent chunked.
+"""
+
+import asyncio
+import mmap
+import os
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class FileUpload:
+    """
+    Iterable upload body for a file on disk.
+
+    Args:
+        path: file to upload.
+        chunk_size: bytes per chunk handed to httpx.
+        use_mmap: yield memoryview slices of an mmap instead of reading into
+            a buffer. Pages already sent are released with MADV_DONTNEED so
+            they do not accumulate in RSS.
+        progress: called as `progress(sent_bytes, total_bytes)` after each
+            chunk has been written to the connection.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        use_mmap: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.use_mmap = use_mmap
+        self.progress = progress
+        self._file = open(path, "rb", buffering=0)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.sent = 0
+
+    def fileno(self) -> int:
+        # httpx sizes the body from this, see peek_filelike_length()
+        return self._file.fileno()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[memoryview]:
+        self.sent = 0
+        if self.use_mmap and self.size > 0:
+            yield from self._iter_mmap()
+        else:
+            yield from self._iter_read()
+
+    def _iter_read(self) -> Iterator[memoryview]:
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        self._file.seek(0)
+        while True:
+            read = self._file.readinto(buffer)
+            if not read:
+                return
+            # the connection has written the chunk by the time we resume,
+            # so the buffer can be refilled in place
+            yield view[:read]
+            self._advance(read)
+
+    def _iter_mmap(self) -> Iterator[memoryview]:
+        with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, self.size, self.chunk_size):
+                    chunk = view[offset : offset + self.chunk_size]
+                    yield chunk
+                    length = len(chunk)
+                    chunk.release()
+                    self._release(mapped, offset, length)
+                    self._advance(length)
+            finally:
+                view.release()
+
+    def _release(self, mapped: mmap.mmap, offset: int, length: int) -> None:
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = offset - offset % mmap.PAGESIZE
+        end = offset + length
+        if end < self.size:
+            end -= end % mmap.PAGESIZE
+        if end > start:
+            mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def _advance(self, length: int) -> None:
+        self.sent += length
+        if self.progress is not None:
+            self.progress(self.sent, self.size)
+
+
+class AsyncFileUpload(FileUpload):
+    """
+    FileUpload for httpx.AsyncClient. Disk reads run in the default executor
+    so a slow disk does not stall the event loop.
+    """
+
+    # httpx picks the sync path for anything iterable, so hide __iter__
+    __iter__ = None
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        self.sent = 0
+        loop = asyncio.get_running_loop()
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        self._file.seek(0)
+        while True:
+            read = await loop.run_in_executor(None, self._file.readinto, buffer)
+            if not read:
+                return
+            yield view[:read]
+            self._advance(read)
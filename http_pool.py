@@ -0,0 +1,293 @@
+"""
+Persistent HTTP connection pool for the Deepgram REST clients.
+
+The SDK's AbstractSyncRestClient and AbstractAsyncRestClient open a new
+`httpx.Client` for every request, so each `transcribe_file`, `transcribe_url`,
+speak or manage call pays for a fresh TCP and TLS handshake and the pool is thrown
+away straight after. The Pooled* clients here are drop-in subclasses that send
+through one long-lived HTTPPool instead:
+
+    with HTTPPool(max_connections=20, keepalive_expiry=60) as pool:
+        prerecorded = PooledPreRecordedClient(deepgram.config, pool)
+        speak = PooledSpeakClient(deepgram.config, pool)
+        for path in paths:
+            prerecorded.transcribe_file(...)   # reuses the same connections
+
+One pool can be shared by any number of clients and threads. HTTP/2 needs the
+`h2` package (`pip install httpx[http2]`).
+"""
+
+import io
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import httpx
+from deepgram import (
+    AsyncManageClient,
+    AsyncPreRecordedClient,
+    AsyncSpeakClient,
+    ManageClient,
+    PreRecordedClient,
+    SpeakClient,
+)
+from deepgram.clients.errors import DeepgramApiError, DeepgramUnknownApiError
+from deepgram.clients.helpers import append_query_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+
+class HTTPPool:
+    """
+    Lazily created `httpx.Client` and `httpx.AsyncClient` sharing one set of
+    pool settings.
+
+    Args:
+        max_connections: total open connections allowed per client.
+        max_keepalive_connections: idle connections kept for reuse.
+        keepalive_expiry: seconds an idle connection is kept before closing.
+        http2: negotiate HTTP/2 where the server supports it.
+        timeout: default timeout for requests that do not pass their own.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    limits=self.limits, http2=self.http2, timeout=self.timeout
+                )
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(
+                    limits=self.limits, http2=self.http2, timeout=self.timeout
+                )
+            return self._async_client
+
+    def close(self) -> None:
+        """
+        Closes the sync client. Use `aclose()` when the async client was used.
+        """
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """
+        Closes both clients.
+        """
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+        self.close()
+
+    def __enter__(self) -> "HTTPPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "HTTPPool":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+def build_url(url: str, params: Optional[Dict], addons: Optional[Dict]) -> str:
+    if params is not None:
+        url = append_query_params(url, params)
+    if addons is not None:
+        url = append_query_params(url, addons)
+    return url
+
+
+def build_headers(config_headers: Dict, headers: Optional[Dict]) -> Dict:
+    # unlike the SDK, do not write per-request headers back into the config
+    merged = dict(config_headers)
+    if headers is not None:
+        merged.update(headers)
+    return merged
+
+
+def dg_header(headers: httpx.Headers, item: str) -> Optional[str]:
+    """
+    Looks up a response header as `item`, `dg-item` or `x-dg-item`.
+    """
+    for name in (item, f"dg-{item}", f"x-dg-{item}"):
+        if name in headers:
+            return headers[name]
+    return None
+
+
+def _file_response(response: httpx.Response, file_result: List) -> Dict:
+    ret = dict()
+    for item in file_result:
+        value = dg_header(response.headers, item)
+        if value is not None:
+            ret[item] = value
+    ret["stream"] = io.BytesIO(response.content)
+    return ret
+
+
+def raise_api_error(e: httpx.HTTPStatusError) -> None:
+    status_code = e.response.status_code or 500
+    try:
+        json_object = json.loads(e.response.text)
+    except ValueError:
+        raise DeepgramUnknownApiError(e.response.text, status_code) from e
+    raise DeepgramApiError(json_object.get("err_msg"), status_code, json.dumps(json_object)) from e
+
+
+class PooledSyncRestMixin:
+    """
+    Replaces AbstractSyncRestClient._handle_request with one that sends
+    through an HTTPPool. Mix in ahead of the SDK client class.
+    """
+
+    def __init__(self, config, pool: Optional[HTTPPool] = None):
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else HTTPPool()
+        super().__init__(config)
+
+    def close(self) -> None:
+        """
+        Closes the pool if this client created it; shared pools are left open.
+        """
+        if self._owns_pool:
+            self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _handle_request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        addons: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        file_result: Optional[List] = None,
+        **kwargs,
+    ):
+        _url = build_url(url, params, addons)
+        _headers = build_headers(self.config.headers, headers)
+        if timeout is None:
+            timeout = self.pool.timeout
+        try:
+            response = self.pool.client.request(
+                method, _url, headers=_headers, timeout=timeout, **kwargs
+            )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise_api_error(e)
+        if file_result is not None:
+            return _file_response(response, file_result)
+        return response.text
+
+
+class PooledAsyncRestMixin:
+    """
+    Replaces AbstractAsyncRestClient._handle_request with one that sends
+    through an HTTPPool. Mix in ahead of the SDK client class.
+    """
+
+    def __init__(self, config, pool: Optional[HTTPPool] = None):
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else HTTPPool()
+        super().__init__(config)
+
+    async def close(self) -> None:
+        """
+        Closes the pool if this client created it; shared pools are left open.
+        """
+        if self._owns_pool:
+            await self.pool.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _handle_request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        addons: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        file_result: Optional[List] = None,
+        **kwargs,
+    ):
+        _url = build_url(url, params, addons)
+        _headers = build_headers(self.config.headers, headers)
+        if timeout is None:
+            timeout = self.pool.timeout
+        try:
+            response = await self.pool.async_client.request(
+                method, _url, headers=_headers, timeout=timeout, **kwargs
+            )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise_api_error(e)
+        if file_result is not None:
+            return _file_response(response, file_result)
+        return response.text
+
+
+class PooledPreRecordedClient(PooledSyncRestMixin, PreRecordedClient):
+    pass
+
+
+class PooledSpeakClient(PooledSyncRestMixin, SpeakClient):
+    pass
+
+
+class PooledManageClient(PooledSyncRestMixin, ManageClient):
+    pass
+
+
+class PooledAsyncPreRecordedClient(PooledAsyncRestMixin, AsyncPreRecordedClient):
+    pass
+
+
+class PooledAsyncSpeakClient(PooledAsyncRestMixin, AsyncSpeakClient):
+    pass
+
+
+class PooledAsyncManageClient(PooledAsyncRestMixin, AsyncManageClient):
+    pass
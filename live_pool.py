@@ -0,0 +1,298 @@
+"""
+Warm pool of pre-opened `v1/listen` connections.
+
+`LiveClient.start()` resolves, connects, negotiates TLS and upgrades to a
+WebSocket when the call begins, so the caller's first words wait on the
+handshake. LivePool opens connections ahead of time, per set of LiveOptions,
+and keeps them alive with `KeepAlive` while idle. A session checks one out,
+registers its handlers and gets the Open event as if it had just connected:
+
+    pool = LivePool(deepgram.config, client_class=FastLiveClient)
+    pool.warm(options, addons, size=2)
+    ...
+    dg_connection = pool.checkout(options, addons, register=session.register)
+    microphone = Microphone(dg_connection.send)
+
+A maintenance thread refills the pool after checkouts, sends the keepalives,
+and replaces connections that died while idle or are older than `max_age`.
+When the pool for a key is empty, checkout() falls back to opening a
+connection synchronously.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from deepgram import LiveClient, LiveOptions, LiveTranscriptionEvents
+from deepgram.clients.live.v1.response import OpenResponse
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = json.dumps({"type": "KeepAlive"})
+
+DEFAULT_SIZE = 2
+# Deepgram closes a connection after about 10 s without audio or KeepAlive
+DEFAULT_KEEPALIVE_INTERVAL = 5.0
+DEFAULT_MAX_AGE = 300.0
+
+
+def options_key(options, addons: Optional[Dict] = None) -> str:
+    """
+    Stable key for a LiveOptions (or dict) plus addons.
+    """
+    values = options.to_dict() if isinstance(options, LiveOptions) else dict(options or {})
+    values.update(addons or {})
+    return json.dumps(values, sort_keys=True, default=str)
+
+
+class _Idle:
+    __slots__ = ("client", "opened", "last_keepalive")
+
+    def __init__(self, client):
+        self.client = client
+        self.opened = time.monotonic()
+        self.last_keepalive = self.opened
+
+
+class _Slot:
+    """
+    Idle connections and target size for one options key.
+    """
+
+    def __init__(self, options: Dict, addons: Optional[Dict], size: int):
+        self.options = options
+        self.addons = addons
+        self.size = size
+        self.idle: deque = deque()
+        self.opening = 0
+
+
+class LivePool:
+    """
+    Args:
+        config: DeepgramClientOptions used for every connection.
+        client_class: LiveClient or a subclass, e.g. FastLiveClient or
+            ResilientLiveClient; constructed as `client_class(config)`.
+        keepalive_interval: seconds between KeepAlive messages on an idle
+            connection.
+        max_age: idle connections older than this are replaced, so a session
+            never gets a socket that an intermediary is about to drop.
+        workers: connections opened in parallel when refilling.
+    """
+
+    def __init__(
+        self,
+        config,
+        client_class: type = LiveClient,
+        keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+        max_age: float = DEFAULT_MAX_AGE,
+        workers: int = 4,
+    ):
+        self.config = config
+        self.client_class = client_class
+        self.keepalive_interval = keepalive_interval
+        self.max_age = max_age
+        self._slots: Dict[str, _Slot] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._opener = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="live-pool-open")
+
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.failed = 0
+        self.stale = 0
+        self.retired = 0
+        self.keepalives = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+        self._thread = threading.Thread(target=self._maintain, name="live-pool", daemon=True)
+        self._thread.start()
+
+    def warm(self, options, addons: Optional[Dict] = None, size: int = DEFAULT_SIZE) -> None:
+        """
+        Keeps `size` idle connections open for these options. Returns at once;
+        see wait_ready().
+        """
+        key = options_key(options, addons)
+        values = options.to_dict() if isinstance(options, LiveOptions) else dict(options or {})
+        with self._cond:
+            slot = self._slots.get(key)
+            if slot is None:
+                self._slots[key] = _Slot(values, dict(addons) if addons is not None else None, size)
+            else:
+                slot.size = size
+            self._cond.notify_all()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until every warmed key has its idle connections open.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: all(len(slot.idle) >= slot.size for slot in self._slots.values()) or self._closed,
+                timeout,
+            )
+
+    def checkout(self, options, addons: Optional[Dict] = None, register: Optional[Callable] = None):
+        """
+        Returns a connected client for these options, or None if a connection
+        could not be opened. `register(client)` is called before the Open event
+        is emitted, so handlers see Open as with `start()`.
+        """
+        key = options_key(options, addons)
+        started = time.perf_counter()
+        client = None
+        with self._cond:
+            slot = self._slots.get(key)
+            while slot is not None and slot.idle:
+                idle = slot.idle.popleft()
+                if self._is_alive(idle.client):
+                    client = idle.client
+                    break
+                self.stale += 1
+                self._retire(idle.client)
+            if client is not None:
+                self.hits += 1
+                took = time.perf_counter() - started
+                self.checkout_seconds_total += took
+                self.checkout_seconds_max = max(self.checkout_seconds_max, took)
+            else:
+                self.misses += 1
+            self._cond.notify_all()
+
+        if client is None:
+            values = options.to_dict() if isinstance(options, LiveOptions) else dict(options or {})
+            client = self._open(values, addons)
+            if client is None:
+                return None
+        if register is not None:
+            register(client)
+        client._emit(
+            LiveTranscriptionEvents.Open,
+            OpenResponse(type=LiveTranscriptionEvents.Open.value),
+        )
+        return client
+
+    def idle(self) -> int:
+        with self._cond:
+            return sum(len(slot.idle) for slot in self._slots.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "idle": sum(len(slot.idle) for slot in self._slots.values()),
+                "opened": self.opened,
+                "failed": self.failed,
+                "stale": self.stale,
+                "retired": self.retired,
+                "keepalives": self.keepalives,
+                "checkout_avg_us": self.checkout_seconds_total / self.hits * 1e6 if self.hits else 0.0,
+                "checkout_max_us": self.checkout_seconds_max * 1e6,
+            }
+
+    def close(self) -> None:
+        """
+        Closes the idle connections and stops the maintenance thread.
+        Checked-out connections belong to their sessions.
+        """
+        with self._cond:
+            self._closed = True
+            idle = [entry.client for slot in self._slots.values() for entry in slot.idle]
+            for slot in self._slots.values():
+                slot.idle.clear()
+            self._cond.notify_all()
+        self._thread.join()
+        for client in idle:
+            self._retire(client)
+        self._opener.shutdown(wait=True)
+
+    def __enter__(self) -> "LivePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _open(self, options: Dict, addons: Optional[Dict]):
+        client = self.client_class(self.config)
+        # start() merges addons into the options dict it is given
+        addons = dict(addons) if addons is not None else None
+        try:
+            started = client.start(dict(options), addons=addons)
+        except Exception as e:
+            logger.error("could not open a live connection: %s", e)
+            started = False
+        with self._cond:
+            if started:
+                self.opened += 1
+            else:
+                self.failed += 1
+        return client if started else None
+
+    def _is_alive(self, client) -> bool:
+        # the SDK sets _exit_event when the listening thread gives up on the
+        # socket, but a clean close from the server only ends the thread
+        listener = getattr(client, "_listen_thread", None)
+        return (
+            client._socket is not None
+            and not client._exit_event.is_set()
+            and listener is not None
+            and listener.is_alive()
+        )
+
+    def _retire(self, client) -> None:
+        # finish() sends CloseStream and sleeps, keep it off the caller's thread
+        try:
+            self._opener.submit(client.finish)
+        except RuntimeError:
+            # the pool is shutting down
+            client.finish()
+
+    def _fill(self, key: str, slot: _Slot) -> None:
+        client = self._open(slot.options, slot.addons)
+        with self._cond:
+            slot.opening -= 1
+            if client is not None and not self._closed and key in self._slots:
+                slot.idle.append(_Idle(client))
+                client = None
+            self._cond.notify_all()
+        if client is not None:
+            self._retire(client)
+
+    def _maintain(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                keepalive = []
+                for key, slot in self._slots.items():
+                    for entry in list(slot.idle):
+                        if not self._is_alive(entry.client):
+                            slot.idle.remove(entry)
+                            self.stale += 1
+                            self._retire(entry.client)
+                        elif now - entry.opened > self.max_age:
+                            slot.idle.remove(entry)
+                            self.retired += 1
+                            self._retire(entry.client)
+                        elif now - entry.last_keepalive >= self.keepalive_interval:
+                            entry.last_keepalive = now
+                            keepalive.append(entry.client)
+                    missing = slot.size - len(slot.idle) - slot.opening
+                    for _ in range(max(0, missing)):
+                        slot.opening += 1
+                        self._opener.submit(self._fill, key, slot)
+                self.keepalives += len(keepalive)
+                self._cond.release()
+                try:
+                    for client in keepalive:
+                        client.send(KEEPALIVE)
+                finally:
+                    self._cond.acquire()
+                self._cond.wait(min(1.0, self.keepalive_interval))
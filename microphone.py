@@ -4,21 +4,34 @@
 
 from dotenv import load_dotenv
 import verboselogs
-from logging import Logger
+import argparse
+import asyncio
 from time import sleep
 import os
 from http import HTTPStatus
-import requests
 from datetime import datetime, timezone
 
 from deepgram import (
     DeepgramClient,
     DeepgramClientOptions,
-    LiveTranscriptionEvents,
+    LiveClient,
     LiveOptions,
     Microphone,
 )
-import json
+from deepgram.audio.microphone import CHANNELS, RATE
+
+from audio_sender import BLOCK, DROP_OLDEST
+from audio_sources import open_audio_file
+from capture import LowLatencyMicrophone, frames_for_ms
+from batching import MessageBatcher
+from delivery import AsyncMessageDelivery, MessageDelivery
+from fast_decode import FastLiveClient
+from live_pool import LivePool
+from nio import AsyncNIOClient, NIOClient
+from outbox import Outbox
+from resilient import ResilientFastLiveClient, ResilientLiveClient
+from session import SessionManager, TranscriptionSession
+from vad import VoiceGate
 
 load_dotenv()
 
@@ -54,98 +67,115 @@ def get_user_event_selection():
             break
     return events
 
-def create_conversation(payload):
-    try:
-        url = os.getenv("NIO_SBX_URL")
-        token = os.getenv("SBX_TESTING_ORG_X_API_KEY")
-        r = requests.post(
-            f"{url}/v2/conversations",
-            data =json.dumps(payload),
-            headers = {
-                "X-API-Key": token,
-                "accept": "application/json",
-                "Content-Type": "application/json",
-            }
-        )
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.HTTPError as errh:
-        Logger.error("Http Error:",errh)
-    except requests.exceptions.ConnectionError as errc:
-        Logger.error("Error Connecting:",errc)
-    except requests.exceptions.Timeout as errt:
-        Logger.error("Timeout Error:",errt)
-    except requests.exceptions.RequestException as err:
-        Logger.error("Oops: Something Else",err)
-
-def add_message(payload, conversation_id):
-    # TODO: Complete code to pull the conversations from a third party service
-    try:
-        url = os.getenv("NIO_SBX_URL")
-        token = os.getenv("SBX_TESTING_ORG_X_API_KEY")
-        r = requests.post(
-            f"{url}/v2/messagelist/{conversation_id}",
-            data =json.dumps(payload),
-            headers = {
-                "X-API-Key": token,
-                "accept": "application/json",
-                "Content-Type": "application/json",
-            }
-        )
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.HTTPError as errh:
-        Logger.error("Http Error:",errh)
-    except requests.exceptions.ConnectionError as errc:
-        Logger.error("Error Connecting:",errc)
-    except requests.exceptions.Timeout as errt:
-        Logger.error("Timeout Error:",errt)
-    except requests.exceptions.RequestException as err:
-        Logger.error("Oops: Something Else",err)
-
-def build_conversation_payload():
-    return {
-        "external_id": "my-deepgram-1",
-        "dealerId": os.getenv("SBX_DEEPGRAM_TOYOTA_DEALER_ID"),
-        "channelType": "deepgram",
-        "deviceType": "string",
-        "timestamp": "2024-06-13T14:56:05.491Z",
-        "category": "string",
-        "shopper_first_name": "string",
-        "shopper_last_name": "string",
-        "vehicle_of_interest": "string",
-        "agent_name": "string"
-    }
-
-def build_add_message_payload(message):
-    return {
-        "additionalInfo1": "string",
-        "additionalInfo2": "string",
-        "additionalInfo3": "string",
-        "id": "dpg-msg-3",
-        "content": message,
-        "senderId": "string",
-        "role": "customer",
-        "userIP": "string",
-        "feedback": "bad",
-        "timestamp": "2024-06-13T15:30:31.364Z",
-        "agentName": "string"
-    }
+def get_session_count():
+    while True:
+        value = input("\nEnter the number of concurrent sessions to run (default 1): ").strip()
+        if value == "":
+            return 1
+        try:
+            count = int(value)
+            if count > 0:
+                return count
+            print("Please enter a positive integer.")
+        except ValueError:
+            print("Invalid input. Please enter a positive integer.")
 
-def end_conversation_payload(conversation_id):
+def build_live_options(endpointing):
+    return LiveOptions(
+        model="nova-2-automotive",
+        # model="automotive",
+        language="en-US",
+        # Apply smart formatting to the output
+        smart_format=True,
+        # Raw audio format details
+        encoding="linear16",
+        channels=1,
+        sample_rate=16000,
+        # To get UtteranceEnd, the following must be set:
+        interim_results=True,
+        utterance_end_ms="1000",
+        vad_events=True,
+        # Time in milliseconds of silence to wait for before finalizing speech
+        endpointing=str(endpointing),
+        # Get the speaker
+        diarize=True,
+        #  adds punctuation and capitalization to your transcript.
+        # punctuate=True,
+    )
+
+def build_live_addons():
     return {
-        "endOfConversation": True,
-        "id": conversation_id
+        # Prevent waiting for additional numbers
+        "no_delay": "true"
     }
 
-# We will collect the is_final=true messages here so we can use them when the person finishes speaking
-is_finals = []
-current_speaker = None
-conversation_id = None
-speakers = []
-
-
-def main():
+# Audio waiting to be sent in asyncio mode, bounded in bytes so it holds the
+# same 8 seconds whatever the frame size
+AUDIO_QUEUE_SECONDS = 8
+AUDIO_QUEUE_BYTES = AUDIO_QUEUE_SECONDS * RATE * CHANNELS * 2
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream audio to Deepgram and store transcripts in NIO")
+    parser.add_argument("--asyncio", action="store_true", help="run on a single asyncio event loop")
+    parser.add_argument("--replay", metavar="FILE", help="replay a WAV or raw linear16 file instead of the microphone")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 1 is real time and 0 is as fast as possible")
+    parser.add_argument("--deepgram-url", default=os.getenv("DEEPGRAM_URL", ""), help="Deepgram host, e.g. ws://127.0.0.1:8765 for fake_deepgram.py")
+    parser.add_argument("--fast-decode", action="store_true", help="decode transcripts with fast_decode.FastLiveClient (threaded mode only)")
+    parser.add_argument("--warm", type=int, default=0, metavar="N", help="pre-open N Deepgram connections (at least one per session) before recording starts (threaded mode)")
+    parser.add_argument("--reconnect", action="store_true", help="reconnect after network errors and replay unacknowledged audio (threaded mode)")
+    parser.add_argument("--frame-ms", type=float, help="capture in frames of this many milliseconds (e.g. 20, 40, 100) instead of the SDK's 512 ms chunks")
+    parser.add_argument("--send-queue-ms", type=int, help="send from a dedicated thread behind a queue holding this much audio (threaded mode)")
+    parser.add_argument("--overflow", choices=[DROP_OLDEST, BLOCK], default=DROP_OLDEST, help="what a full send queue does with new audio")
+    parser.add_argument("--vad", action="store_true", help="only send audio around detected speech, KeepAlive otherwise")
+    parser.add_argument("--outbox", metavar="DB", help="persist NIO messages in this SQLite file before posting them and resend undelivered ones on the next start")
+    parser.add_argument("--vad-hangover-ms", type=int, default=1500, help="audio still sent after speech stops; keep above endpointing and utterance_end_ms")
+    args = parser.parse_args()
+    if args.asyncio:
+        threaded = [
+            flag
+            for flag, value in (
+                ("--warm", args.warm),
+                ("--reconnect", args.reconnect),
+                ("--fast-decode", args.fast_decode),
+                ("--send-queue-ms", args.send_queue_ms),
+            )
+            if value
+        ]
+        if threaded:
+            parser.error(f"{', '.join(threaded)} only work in threaded mode, not with --asyncio")
+    return args
+
+
+def build_source_factory(args):
+    """
+    Returns `factory(push_callback)` building the audio source selected on the
+    command line.
+    """
+    if args.replay:
+        kwargs = {"speed": args.speed}
+        if args.frame_ms:
+            kwargs["chunk"] = frames_for_ms(args.frame_ms)
+        return lambda push_callback: open_audio_file(args.replay, push_callback, **kwargs)
+    if args.frame_ms:
+        return lambda push_callback: LowLatencyMicrophone(push_callback, frame_ms=args.frame_ms)
+    return Microphone
+
+
+def build_client_class(args):
+    if args.reconnect:
+        return ResilientFastLiveClient if args.fast_decode else ResilientLiveClient
+    return FastLiveClient if args.fast_decode else None
+
+
+def build_sender_options(args):
+    if not args.send_queue_ms:
+        return None
+    # linear16 mono at 16 kHz is 32 bytes per millisecond
+    return {"max_bytes": args.send_queue_ms * 32, "policy": args.overflow}
+
+
+def main(args):
     try:
         # example of setting up a client config. logging values: WARNING, VERBOSE, DEBUG, SPAM
         # config = DeepgramClientOptions(
@@ -154,170 +184,204 @@ def main():
         # deepgram: DeepgramClient = DeepgramClient("", config)
         # otherwise, use default config
         deepgram_api_key = os.getenv("DEEPGRAM_API_KEY", "")
-        deepgram = DeepgramClient(deepgram_api_key)
+        deepgram = DeepgramClient(deepgram_api_key, DeepgramClientOptions(url=args.deepgram_url))
 
-        dg_connection = deepgram.listen.live.v("1")
         user_events = get_user_event_selection()
         endpointing = get_endpointing_value()
-
-        def on_open(self, open, **kwargs):
-            global conversation_id
-            print(f"Connection Open")
-            payload = build_conversation_payload()
-            response = create_conversation(payload)
-            conversation_id = response["id"]
-            print(f"{ conversation_id = }")
-
-        def on_message(self, result, **kwargs):
-            global is_finals
-            global current_speaker
-            global speakers
-            sentence = result.channel.alternatives[0].transcript
-            # Check if speaker exist on the current message
-            if result.channel.alternatives and result.channel.alternatives[0].words:
-                current_speaker = result.channel.alternatives[0].words[0].speaker
-                # speakers = [word.speaker for word in result.channel.alternatives[0].words]
-                
-            if len(sentence) == 0:
-                return
-            
-            if result.is_final:
-                # We need to collect these and concatenate them together when we get a speech_final=true
-                # See docs: https://developers.deepgram.com/docs/understand-endpointing-interim-results
-                is_finals.append(sentence)
-                # print(f"{sentence = }")
-                # return
-
-                # Speech Final means we have detected sufficent silence to consider this end of speech
-                # Speech final is the lowest latency result as it triggers as soon an the endpointing value has triggered
-                if result.speech_final:
-                    utterance =  " ".join(is_finals)
-                    line = f"Speaker - {current_speaker} Speech Final - {utterance}"
-                    print(line)
-                    # Reset Is Finals Event
-                    is_finals = []
-                    # Reset current_speaker
-                    current_speaker = None
-                    # Reset list of speakers in a sentence
-                    speakers = []
-                    # Adds message to conversation based on user preferences
-                    if user_events["speech_final"]:
-                        print("Adding message to conversation!")
-                        payload = build_add_message_payload(line)
-                        add_message(payload, conversation_id)
-                else:
-                    # These are useful if you need real time captioning and update what the Interim Results produced
-                    line = f"Speaker - {current_speaker} Is Final - {sentence}"
-                    print(line)
-                    # Adds message to conversation based on user preferences
-                    if user_events["is_final"]:
-                        print("Adding message to conversation!")
-                        payload = build_add_message_payload(line)
-                        add_message(payload, conversation_id)
-            else:
-                line = f"Speaker - {current_speaker} - Interim Results - {sentence}"
-                # These are useful if you need real time captioning of what is being spoken
-                print(line)
-                # Adds message to conversation based on user preferences
-                if user_events["interim_results"]:
-                    print("Adding message to conversation!")
-                    payload = build_add_message_payload(line)
-                    add_message(payload, conversation_id)
-
-        def on_metadata(self, metadata, **kwargs):
-            print(f"Metadata: {metadata}")
-            pass
-
-        def on_speech_started(self, speech_started, **kwargs):
-            print(f"Speech Started")
-
-        def on_utterance_end(self, utterance_end, **kwargs):
-            print(f"Utterance End")
-            global is_finals
-            if len(is_finals) > 0:
-                utterance = " ".join(is_finals)
-                line = f"Utterance End: {utterance}"
-                print(line)
-                is_finals = []
-                # Adds message to conversation based on user preferences
-                if user_events["utterance_end"]:
-                    print("Adding message to conversation!")
-                    payload = build_add_message_payload(line)
-                    add_message(payload, conversation_id)
-
-        def on_close(self, close, **kwargs):
-            global conversation_id
-            print(f"Connection Closed")
-            end_conversation_payload(conversation_id)
-            conversation_id = None
-            print("Conversation Ended!")
-
-
-        def on_error(self, error, **kwargs):
-            print(f"Handled Error: {error}")
-
-        def on_unhandled(self, unhandled, **kwargs):
-            print(f"Unhandled Websocket Message: {unhandled}")
-
-        dg_connection.on(LiveTranscriptionEvents.Open, on_open)
-        dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
-        dg_connection.on(LiveTranscriptionEvents.Metadata, on_metadata)
-        dg_connection.on(LiveTranscriptionEvents.SpeechStarted, on_speech_started)
-        dg_connection.on(LiveTranscriptionEvents.UtteranceEnd, on_utterance_end)
-        dg_connection.on(LiveTranscriptionEvents.Close, on_close)
-        dg_connection.on(LiveTranscriptionEvents.Error, on_error)
-        dg_connection.on(LiveTranscriptionEvents.Unhandled, on_unhandled)
-
-        options: LiveOptions = LiveOptions(
-            model="nova-2-automotive",
-            # model="automotive",
-            language="en-US",
-            # Apply smart formatting to the output
-            smart_format=True,
-            # Raw audio format details
-            encoding="linear16",
-            channels=1,
-            sample_rate=16000,
-            # To get UtteranceEnd, the following must be set:
-            interim_results=True,
-            utterance_end_ms="1000",
-            vad_events=True,
-            # Time in milliseconds of silence to wait for before finalizing speech
-            endpointing=str(endpointing),
-            # Get the speaker
-            diarize=True,
-            #  adds punctuation and capitalization to your transcript.
-            # punctuate=True,
+        sessions = get_session_count()
+
+        # NIO messages are posted from background workers so a slow response
+        # never stalls the websocket receive thread
+        nio = NIOClient.from_env()
+        outbox = Outbox(args.outbox, nio.add_messages) if args.outbox else None
+        delivery = MessageDelivery(outbox.deliver if outbox else nio.add_messages)
+        delivery.start()
+        flush_fn = delivery.submit
+        if outbox is not None:
+            # batches are written to disk before they are posted; this also
+            # resends whatever an earlier run could not deliver
+            outbox.start(delivery.submit)
+            flush_fn = outbox.submit
+        # Transcript fragments are coalesced per conversation into list requests
+        batcher = MessageBatcher(flush_fn)
+        batcher.start()
+
+        options = build_live_options(endpointing)
+        addons = build_live_addons()
+        # Connections are opened ahead of time so sessions start without a handshake
+        pool = None
+        if args.warm:
+            pool = LivePool(deepgram.config, client_class=build_client_class(args) or LiveClient)
+            pool.warm(options, addons, size=max(args.warm, sessions))
+            if not pool.wait_ready(timeout=10):
+                print("Deepgram connections are still opening")
+
+        # Every session gets its own Deepgram connection and NIO conversation.
+        # Each one opens the default input device, or replays the same file.
+        source_factory = build_source_factory(args)
+        manager = SessionManager(
+            deepgram,
+            nio,
+            batcher,
+            user_events,
+            options,
+            addons=addons,
+            source_factory=source_factory,
+            client_class=build_client_class(args),
+            vad={"hangover_ms": args.vad_hangover_ms} if args.vad else None,
+            sender=build_sender_options(args),
+            pool=pool,
         )
 
-        addons = {
-            # Prevent waiting for additional numbers
-            "no_delay": "true"
-        }
-
-        print("\n\nPress Enter to stop recording...\n\n")
-        if dg_connection.start(options, addons=addons) is False:
+        if not args.replay:
+            print("\n\nPress Enter to stop recording...\n\n")
+        if not manager.start(sessions):
             print("Failed to connect to Deepgram")
+            if pool is not None:
+                pool.close()
+            if outbox is not None:
+                outbox.close()
             return
 
-        # Open a microphone stream on the default input device
-        microphone = Microphone(dg_connection.send)
+        # wait until finished
+        if args.replay:
+            manager.wait()
+        else:
+            input("")
+
+        # Close the microphones and connections
+        manager.finish()
+        if pool is not None:
+            pool.close()
+            print(f"Pool: {pool.metrics()}")
+
+        # Flush any messages still waiting to be posted
+        batcher.close()
+        if outbox is not None:
+            outbox.flush()
+        delivery.finish(timeout=30)
+        if outbox is not None:
+            outbox.close()
+        print(f"Sessions: {manager.metrics()}")
+        print(f"Batching: {batcher.metrics()}")
+        print(f"Delivery: {delivery.metrics()}")
+        if outbox is not None:
+            print(f"Outbox: {outbox.metrics()}")
+        nio.close()
 
-        # start microphone
+        print("Finished")
+        # sleep(30)  # wait 30 seconds to see if there is any additional socket activity
+        # print("Really done!")
+
+    except Exception as e:
+        print(f"Could not open socket: {e}")
+        return
+
+
+async def async_main(args):
+    """
+    asyncio mode: websocket send/receive and NIO posting share one event loop.
+    PyAudio still captures on its own callback thread, which only hands frames
+    to the loop.
+    """
+    try:
+        deepgram_api_key = os.getenv("DEEPGRAM_API_KEY", "")
+        deepgram = DeepgramClient(deepgram_api_key, DeepgramClientOptions(url=args.deepgram_url))
+
+        dg_connection = deepgram.listen.asynclive.v("1")
+        user_events = get_user_event_selection()
+        endpointing = get_endpointing_value()
+
+        loop = asyncio.get_running_loop()
+        nio = AsyncNIOClient.from_env()
+        outbox = Outbox(args.outbox, nio.add_messages) if args.outbox else None
+        delivery = AsyncMessageDelivery(outbox.deliver_async if outbox else nio.add_messages)
+        delivery.start()
+        flush_fn = delivery.submit
+        if outbox is not None:
+            outbox.start(delivery.submit)
+            flush_fn = outbox.submit
+        batcher = MessageBatcher(flush_fn)
+        batcher.start()
+
+        session = TranscriptionSession(nio, batcher, user_events)
+        session.register(dg_connection)
+
+        options = build_live_options(endpointing)
+        addons = build_live_addons()
+
+        if not args.replay:
+            print("\n\nPress Enter to stop recording...\n\n")
+        if await dg_connection.start(options, addons=addons) is False:
+            print("Failed to connect to Deepgram")
+            if outbox is not None:
+                outbox.close()
+            return
+
+        # The PyAudio callback thread only enqueues; sending happens on the loop
+        audio = asyncio.Queue()
+        queued = 0
+
+        def enqueue(data):
+            nonlocal queued
+            # None ends the stream; it is always queued and never evicts audio
+            if data is not None:
+                while queued + len(data) > AUDIO_QUEUE_BYTES and not audio.empty():
+                    queued -= len(audio.get_nowait())
+                queued += len(data)
+            audio.put_nowait(data)
+
+        async def sender():
+            nonlocal queued
+            while True:
+                data = await audio.get()
+                if data is None:
+                    return
+                queued -= len(data)
+                await dg_connection.send(data)
+
+        send_task = asyncio.create_task(sender())
+        push = lambda data: loop.call_soon_threadsafe(enqueue, data)
+        gate = None
+        if args.vad:
+            gate = VoiceGate(push, hangover_ms=args.vad_hangover_ms)
+            session.audio_clock = gate.capture_offset
+            push = gate.push
+        microphone = build_source_factory(args)(push)
         microphone.start()
 
-        # wait until finished
-        input("")
+        # wait until finished without blocking the loop
+        if args.replay:
+            await loop.run_in_executor(None, microphone.wait)
+        else:
+            await loop.run_in_executor(None, input, "")
 
-        # Wait for the microphone to close
         microphone.finish()
-
-        # Indicate that we've finished
-        dg_connection.finish()
+        loop.call_soon_threadsafe(enqueue, None)
+        await send_task
+        await dg_connection.finish()
+        # finish() cancels a Close handler still waiting for the conversation
+        await session.wait_conversation_async(session.conversation_timeout)
+
+        # Flush any messages still waiting to be posted
+        batcher.close()
+        if outbox is not None:
+            await loop.run_in_executor(None, outbox.flush)
+        await delivery.finish(timeout=30)
+        if outbox is not None:
+            outbox.close()
+        print(f"Session: {session.metrics.snapshot()}")
+        if gate is not None:
+            print(f"VAD: {gate.metrics()}")
+        if hasattr(microphone, "metrics"):
+            print(f"Capture: {microphone.metrics()}")
+        print(f"Batching: {batcher.metrics()}")
+        print(f"Delivery: {delivery.metrics()}")
+        if outbox is not None:
+            print(f"Outbox: {outbox.metrics()}")
+        await nio.close()
 
         print("Finished")
-        # sleep(30)  # wait 30 seconds to see if there is any additional socket activity
-        # print("Really done!")
 
     except Exception as e:
         print(f"Could not open socket: {e}")
@@ -325,4 +389,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.asyncio:
+        asyncio.run(async_main(args))
+    else:
+        main(args)
@@ -0,0 +1,336 @@
+"""
+Clients for the NIO conversation API.
+
+A single NIOClient keeps one `requests.Session` for its lifetime, so every call
+reuses pooled keep-alive connections instead of paying a new TCP/TLS handshake.
+AsyncNIOClient is the asyncio equivalent built on `httpx.AsyncClient`.
+
+Messages are identified by their conversation's external id, a per-conversation
+sequence number and a digest of their content (see message_id()), so a message
+built twice, e.g. by a retry or an outbox replay, carries the same id.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5.0, 15.0)
+DEFAULT_POOL_SIZE = 10
+# sent with message posts so a retried request is not stored twice
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def new_external_id() -> str:
+    return f"deepgram-{uuid.uuid4().hex}"
+
+
+def iso_timestamp(when: Optional[datetime] = None) -> str:
+    """
+    UTC timestamp in the API's format, e.g. 2024-06-13T15:30:31.364Z.
+    """
+    when = (when or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return when.strftime("%Y-%m-%dT%H:%M:%S.") + f"{when.microsecond // 1000:03d}Z"
+
+
+def message_id(external_id: str, sequence: int, content: str) -> str:
+    """
+    Id of the `sequence`-th message of a conversation. The sequence orders the
+    messages; the content digest keeps a reused sequence number from passing
+    for an earlier message.
+    """
+    digest = hashlib.sha256(f"{external_id}\n{sequence}\n{content}".encode()).hexdigest()[:16]
+    return f"{external_id}-{sequence:06d}-{digest}"
+
+
+def build_conversation_payload(external_id: Optional[str] = None, timestamp: Optional[str] = None):
+    return {
+        "external_id": external_id or new_external_id(),
+        "dealerId": os.getenv("SBX_DEEPGRAM_TOYOTA_DEALER_ID"),
+        "channelType": "deepgram",
+        "deviceType": "string",
+        "timestamp": timestamp or iso_timestamp(),
+        "category": "string",
+        "shopper_first_name": "string",
+        "shopper_last_name": "string",
+        "vehicle_of_interest": "string",
+        "agent_name": "string"
+    }
+
+
+def build_add_message_payload(message, id: Optional[str] = None, timestamp: Optional[str] = None):
+    """
+    `id` should come from message_id(); without one a random id is used, which
+    cannot be deduplicated. `timestamp` defaults to now.
+    """
+    return {
+        "additionalInfo1": "string",
+        "additionalInfo2": "string",
+        "additionalInfo3": "string",
+        "id": id or f"dpg-msg-{uuid.uuid4().hex}",
+        "content": message,
+        "senderId": "string",
+        "role": "customer",
+        "userIP": "string",
+        "feedback": "bad",
+        "timestamp": timestamp or iso_timestamp(),
+        "agentName": "string"
+    }
+
+
+def end_conversation_payload(conversation_id):
+    return {
+        "endOfConversation": True,
+        "id": conversation_id
+    }
+
+
+class NIOClient:
+    """
+    Reusable client for `/v2/conversations` and `/v2/messagelist/{id}`.
+
+    Args:
+        url: base URL of the NIO environment.
+        api_key: value sent as `X-API-Key`.
+        timeout: default timeout for every request, either seconds or a
+            `(connect, read)` tuple. Individual calls may override it.
+        pool_size: connections kept open per host. Should be at least the number
+            of threads posting concurrently.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "X-API-Key": api_key,
+                "accept": "application/json",
+                "Content-Type": "application/json",
+            }
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "NIOClient":
+        """
+        Builds a client from `NIO_SBX_URL` and `SBX_TESTING_ORG_X_API_KEY`.
+        """
+        return cls(
+            os.getenv("NIO_SBX_URL", ""),
+            os.getenv("SBX_TESTING_ORG_X_API_KEY", ""),
+            **kwargs,
+        )
+
+    def create_conversation(
+        self, payload: Dict, timeout: Optional[Timeout] = None
+    ) -> Optional[Dict]:
+        return self._post("/v2/conversations", payload, timeout)
+
+    def add_message(
+        self,
+        payload: Dict,
+        conversation_id: str,
+        timeout: Optional[Timeout] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[Dict]:
+        return self._post(
+            f"/v2/messagelist/{conversation_id}", payload, timeout, _idempotency(idempotency_key)
+        )
+
+    def add_messages(
+        self,
+        payloads: List[Dict],
+        conversation_id: str,
+        timeout: Optional[Timeout] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """
+        Posts several messages to a conversation as a single list request.
+        `idempotency_key` is sent as the Idempotency-Key header, so a request
+        that is retried with the same key is only applied once.
+        """
+        return self._post(
+            f"/v2/messagelist/{conversation_id}", payloads, timeout, _idempotency(idempotency_key)
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "NIOClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _post(
+        self,
+        path: str,
+        payload: Union[Dict, List],
+        timeout: Optional[Timeout],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Optional[Dict]:
+        try:
+            r = self.session.post(
+                f"{self.url}{path}",
+                data=json.dumps(payload),
+                timeout=self.timeout if timeout is None else timeout,
+                headers=headers,
+            )
+            r.raise_for_status()
+            return _response_body(r)
+        except requests.exceptions.HTTPError as errh:
+            logger.error("Http Error: %s", errh)
+        except requests.exceptions.ConnectionError as errc:
+            logger.error("Error Connecting: %s", errc)
+        except requests.exceptions.Timeout as errt:
+            logger.error("Timeout Error: %s", errt)
+        except requests.exceptions.RequestException as err:
+            logger.error("Oops: Something Else: %s", err)
+        return None
+
+
+class AsyncNIOClient:
+    """
+    asyncio client for the NIO conversation API, sharing one pooled
+    `httpx.AsyncClient` across every stream running on the event loop.
+
+    Takes the same arguments as NIOClient. Must be closed with `await close()`
+    or used as an async context manager.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        self.url = url.rstrip("/")
+        self.timeout = _httpx_timeout(timeout)
+        self.client = httpx.AsyncClient(
+            headers={
+                "X-API-Key": api_key,
+                "accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+        )
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "AsyncNIOClient":
+        return cls(
+            os.getenv("NIO_SBX_URL", ""),
+            os.getenv("SBX_TESTING_ORG_X_API_KEY", ""),
+            **kwargs,
+        )
+
+    async def create_conversation(
+        self, payload: Dict, timeout: Optional[Timeout] = None
+    ) -> Optional[Dict]:
+        return await self._post("/v2/conversations", payload, timeout)
+
+    async def add_message(
+        self,
+        payload: Dict,
+        conversation_id: str,
+        timeout: Optional[Timeout] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[Dict]:
+        return await self._post(
+            f"/v2/messagelist/{conversation_id}", payload, timeout, _idempotency(idempotency_key)
+        )
+
+    async def add_messages(
+        self,
+        payloads: List[Dict],
+        conversation_id: str,
+        timeout: Optional[Timeout] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Optional[Dict]:
+        return await self._post(
+            f"/v2/messagelist/{conversation_id}", payloads, timeout, _idempotency(idempotency_key)
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncNIOClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _post(
+        self,
+        path: str,
+        payload: Union[Dict, List],
+        timeout: Optional[Timeout],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Optional[Dict]:
+        try:
+            r = await self.client.post(
+                f"{self.url}{path}",
+                content=json.dumps(payload),
+                timeout=self.timeout if timeout is None else _httpx_timeout(timeout),
+                headers=headers,
+            )
+            r.raise_for_status()
+            return _response_body(r)
+        except httpx.HTTPStatusError as errh:
+            logger.error("Http Error: %s", errh)
+        except httpx.ConnectError as errc:
+            logger.error("Error Connecting: %s", errc)
+        except httpx.TimeoutException as errt:
+            logger.error("Timeout Error: %s", errt)
+        except httpx.HTTPError as err:
+            logger.error("Oops: Something Else: %s", err)
+        return None
+
+
+def _response_body(r) -> Dict:
+    """
+    Decoded body of a 2xx response. An empty or non-JSON body, e.g. a 204, is
+    still a success and comes back as {} rather than None.
+    """
+    if not r.content:
+        return {}
+    try:
+        return r.json()
+    except ValueError:
+        logger.warning("NIO returned %s with a non-JSON body", r.status_code)
+        return {}
+
+
+def _idempotency(key: Optional[str]) -> Optional[Dict[str, str]]:
+    return {IDEMPOTENCY_HEADER: key} if key else None
+
+
+def _httpx_timeout(timeout: Timeout) -> httpx.Timeout:
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
@@ -0,0 +1,343 @@
+"""
+Write-ahead outbox for NIO messages.
+
+MessageDelivery only keeps batches in memory, so if the process dies, or NIO
+is down until it exits, every transcript that was not posted yet is lost.
+Outbox sits between the batcher and the delivery pool. It persists each batch
+in SQLite (WAL mode) before a worker sends it, and marks it acknowledged once
+NIO answers with a 2xx. Whatever is unacknowledged when the process stops is
+sent again by the next `start()`:
+
+    outbox = Outbox("nio-outbox.db", nio.add_messages)
+    delivery = MessageDelivery(outbox.deliver)
+    delivery.start()
+    outbox.start(delivery.submit)
+    batcher = MessageBatcher(outbox.submit)
+    ...
+    batcher.close()
+    outbox.flush()
+    delivery.finish(timeout=30)
+    outbox.close()
+
+Each batch gets an idempotency key when it is first written, and every send of
+the batch carries that key. A batch that was delivered but not yet marked when
+the process died is therefore not stored twice by NIO. Batches whose messages
+carry ids (nio.message_id) get a key derived from those ids, so submitting the
+same messages again is recognized here as well, and only one copy is sent.
+
+Writes are group committed. One writer thread inserts everything that arrived
+while the previous commit was syncing in a single transaction, so under load
+one fsync covers many batches. Acknowledgements ride along with the next
+commit, or are written on their own every `ack_interval` seconds when nothing
+else is. Losing one only causes a resend, which the idempotency key absorbs.
+
+Batches the delivery pool drops when full, or fails to post, stay pending in
+the database until the next start().
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMIT_DELAY_MS = 0
+# acknowledgements alone are committed at most this often
+DEFAULT_ACK_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    conversation_id TEXT,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    acked REAL
+)
+"""
+
+
+def batch_key(payload: Any, conversation_id: Optional[str]) -> str:
+    """
+    Idempotency key for a batch: derived from the message ids when every
+    message has one, random otherwise.
+    """
+    messages = payload if isinstance(payload, list) else [payload]
+    ids = [message.get("id") if isinstance(message, dict) else None for message in messages]
+    if not ids or None in ids:
+        return uuid.uuid4().hex
+    return hashlib.sha256("\n".join([str(conversation_id)] + ids).encode()).hexdigest()[:32]
+
+
+class OutboxEntry:
+    """
+    A persisted batch on its way through the delivery pool. `id` is None when
+    the batch could not be written and is delivered without a durable copy.
+    """
+
+    __slots__ = ("id", "key", "payload", "conversation_id")
+
+    def __init__(self, id: Optional[int], key: str, payload: Any, conversation_id: Optional[str]):
+        self.id = id
+        self.key = key
+        self.payload = payload
+        self.conversation_id = conversation_id
+
+
+class Outbox:
+    """
+    Args:
+        path: SQLite database file; created if missing.
+        send: called as `send(payload, conversation_id, idempotency_key=key)`,
+            e.g. `NIOClient.add_messages`, or a coroutine function such as
+            `AsyncNIOClient.add_messages` when used with `deliver_async`. A
+            return value other than None acknowledges the batch.
+        commit_delay_ms: how long the writer waits for more batches before
+            committing. 0 commits as soon as the previous commit finished,
+            which already groups whatever arrived in the meantime.
+        synchronous: SQLite `synchronous` pragma. FULL syncs every commit;
+            NORMAL only syncs at WAL checkpoints and can lose the last commits
+            on power loss, but not on a process crash.
+        ack_interval: longest time an acknowledgement waits for a commit.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        send: Callable[..., Any],
+        commit_delay_ms: float = DEFAULT_COMMIT_DELAY_MS,
+        synchronous: str = "FULL",
+        ack_interval: float = DEFAULT_ACK_INTERVAL,
+    ):
+        self.path = path
+        self.send = send
+        self.commit_delay = commit_delay_ms / 1000.0
+        self.synchronous = synchronous
+        self.ack_interval = ack_interval
+        self._forward = None
+        self._db = None
+        self._thread = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._busy = False
+        # (payload, conversation_id) waiting to be written
+        self._incoming: deque = deque()
+        self._acks: List[int] = []
+
+        self.appended = 0
+        self.replayed = 0
+        self.acked = 0
+        self.failed = 0
+        self.unpersisted = 0
+        self.duplicates = 0
+        self.commits = 0
+        self.committed_records = 0
+        self.commit_seconds_total = 0.0
+        self.commit_seconds_max = 0.0
+
+    def start(self, forward: Callable[[OutboxEntry, Optional[str]], Any]) -> None:
+        """
+        Opens the database, hands every unacknowledged batch from earlier runs
+        to `forward` and starts the writer. `forward(entry, conversation_id)`
+        must not block, e.g. `MessageDelivery.submit`.
+        """
+        if self._thread is not None:
+            return
+        self._forward = forward
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={self.synchronous}")
+        self._db.execute(SCHEMA)
+        self._db.execute("DELETE FROM outbox WHERE acked IS NOT NULL")
+        rows = self._db.execute(
+            "SELECT id, idempotency_key, conversation_id, payload FROM outbox ORDER BY id"
+        ).fetchall()
+        if rows:
+            logger.warning("replaying %d undelivered NIO batches from %s", len(rows), self.path)
+        with self._cond:
+            self._closed = False
+            self.replayed += len(rows)
+        # replayed batches are handed over before any new one, keeping the order
+        for id, key, conversation_id, payload in rows:
+            forward(OutboxEntry(id, key, json.loads(payload), conversation_id), conversation_id)
+        self._thread = threading.Thread(target=self._run, name="nio-outbox", daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: Any, conversation_id: Optional[str]) -> bool:
+        """
+        Flush callback for MessageBatcher. Only queues the batch for the
+        writer, which persists it and then forwards it.
+        """
+        with self._cond:
+            if self._closed:
+                logger.warning("outbox closed, dropping batch for %s", conversation_id)
+                return False
+            self._incoming.append((payload, conversation_id))
+            self._cond.notify_all()
+        return True
+
+    def deliver(self, entry: OutboxEntry, conversation_id: Optional[str]) -> Any:
+        """
+        Send function for MessageDelivery.
+        """
+        result = None
+        try:
+            result = self.send(entry.payload, conversation_id, idempotency_key=entry.key)
+            return result
+        finally:
+            self._settle(entry, result)
+
+    async def deliver_async(self, entry: OutboxEntry, conversation_id: Optional[str]) -> Any:
+        """
+        Send function for AsyncMessageDelivery.
+        """
+        result = None
+        try:
+            result = await self.send(entry.payload, conversation_id, idempotency_key=entry.key)
+            return result
+        finally:
+            self._settle(entry, result)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until every submitted batch is persisted and forwarded.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._incoming and not self._busy, timeout)
+
+    def pending(self) -> int:
+        """
+        Batches written or replayed that were not acknowledged yet.
+        """
+        with self._cond:
+            return self.appended + self.replayed - self.acked
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "appended": self.appended,
+                "replayed": self.replayed,
+                "acked": self.acked,
+                "failed": self.failed,
+                "pending": self.appended + self.replayed - self.acked,
+                "unpersisted": self.unpersisted,
+                "duplicates": self.duplicates,
+                "commits": self.commits,
+                "records_per_commit": self.committed_records / self.commits if self.commits else 0.0,
+                "commit_latency_avg": self.commit_seconds_total / self.commits if self.commits else 0.0,
+                "commit_latency_max": self.commit_seconds_max,
+            }
+
+    def close(self) -> None:
+        """
+        Writes what is still queued along with the last acknowledgements and
+        closes the database. Unacknowledged batches stay for the next start().
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._db is not None:
+            try:
+                self._db.execute("DELETE FROM outbox WHERE acked IS NOT NULL")
+            except sqlite3.Error as e:
+                logger.error("outbox cleanup failed: %s", e)
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> "Outbox":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _settle(self, entry: OutboxEntry, result: Any) -> None:
+        with self._cond:
+            if result is None:
+                self.failed += 1
+                return
+            if entry.id is not None:
+                # no notify, acks wait for the next commit
+                self._acks.append(entry.id)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._incoming or self._closed, self.ack_interval)
+                closed = self._closed
+            if self.commit_delay and not closed:
+                # let more batches join this commit
+                time.sleep(self.commit_delay)
+            with self._cond:
+                if not self._incoming and not self._acks:
+                    if self._closed:
+                        return
+                    continue
+                incoming, self._incoming = list(self._incoming), deque()
+                acks, self._acks = self._acks, []
+                self._busy = True
+            try:
+                for entry in self._commit(incoming, acks):
+                    self._forward(entry, entry.conversation_id)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _commit(self, incoming: List[tuple], acks: List[int]) -> List[OutboxEntry]:
+        started = time.monotonic()
+        now = time.time()
+        entries = [
+            OutboxEntry(None, batch_key(payload, conversation_id), payload, conversation_id)
+            for payload, conversation_id in incoming
+        ]
+        duplicates = 0
+        try:
+            self._db.execute("BEGIN")
+            written = []
+            for entry in entries:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO outbox (idempotency_key, conversation_id, payload, created) VALUES (?, ?, ?, ?)",
+                    (entry.key, entry.conversation_id, json.dumps(entry.payload), now),
+                )
+                if cursor.rowcount == 0:
+                    # already in the outbox, delivered or on its way
+                    duplicates += 1
+                    continue
+                entry.id = cursor.lastrowid
+                written.append(entry)
+            self._db.executemany("UPDATE outbox SET acked = ? WHERE id = ?", [(now, id) for id in acks])
+            self._db.execute("COMMIT")
+            entries = written
+            persisted = True
+        except sqlite3.Error as e:
+            # still deliver, just without a durable copy; lost acks mean a resend
+            logger.error("outbox commit failed, delivering without persistence: %s", e)
+            try:
+                self._db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for entry in entries:
+                entry.id = None
+            persisted = False
+        took = time.monotonic() - started
+        with self._cond:
+            self.commits += 1
+            self.committed_records += len(entries) + len(acks)
+            self.commit_seconds_total += took
+            self.commit_seconds_max = max(self.commit_seconds_max, took)
+            self.duplicates += duplicates
+            if persisted:
+                self.appended += len(entries)
+                self.acked += len(acks)
+            else:
+                self.unpersisted += len(entries)
+        return entries
@@ -0,0 +1,332 @@
+"""
+Live transcription that survives network blips.
+
+When `LiveClient._listening` hits a WebSocketException it emits Error, calls
+`_signal_exit()` and the call is over, while the microphone keeps pushing audio
+into a dead socket. ResilientLiveClient keeps the session instead: the failed
+socket is replaced from the listening thread with exponential backoff, audio
+sent in the meantime is kept, and once connected again everything after the
+last finalized transcript is replayed so no speech is lost:
+
+    dg_connection = ResilientLiveClient(deepgram.config)
+    session.register(dg_connection)
+    dg_connection.start(options)
+
+Every audio byte sent is kept for `replay_seconds` in a ring, indexed by its
+position in the session's audio stream. `is_final` Results mark audio as
+acknowledged. After a reconnect the new connection starts at the first
+unacknowledged sample, and because Deepgram's timestamps restart at zero on
+every connection, Results, SpeechStarted and UtteranceEnd times are shifted by
+that position. Handlers see one continuous timeline and a single Open/Close
+pair for the whole call.
+
+Audio is assumed to be linear16 with the sample_rate and channels given in the
+LiveOptions, as elsewhere in this project.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import websockets
+from deepgram import LiveClient, LiveOptions, LiveTranscriptionEvents
+from deepgram.audio.microphone import CHANNELS, RATE
+from deepgram.clients.live.helpers import append_query_params
+from websockets.sync.client import connect
+
+from backoff import backoff_delay
+from fast_decode import FastLiveClient, FastResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLAY_SECONDS = 30.0
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 10.0
+
+SAMPLE_WIDTH = 2
+
+
+def rebase_result(result, offset: float) -> None:
+    """
+    Shifts a Results message (LiveResultResponse or fast_decode.FastResult)
+    and its words by `offset` seconds, in place.
+    """
+    result.start += offset
+    if isinstance(result, FastResult):
+        # FastWords are built from the raw dicts on access
+        result.raw["start"] = result.start
+        for alternative in (result.raw.get("channel") or {}).get("alternatives") or ():
+            for word in alternative.get("words") or ():
+                word["start"] += offset
+                word["end"] += offset
+        return
+    for alternative in result.channel.alternatives or ():
+        for word in alternative.words or ():
+            word.start += offset
+            word.end += offset
+
+
+class ResilientMixin:
+    """
+    Reconnect, replay and re-basing for LiveClient and its subclasses.
+
+    Args:
+        config: DeepgramClientOptions, as for LiveClient.
+        replay_seconds: audio kept for replay. A blip longer than this loses
+            the oldest unacknowledged audio, counted in `lost_seconds`.
+        max_attempts: reconnect attempts per outage before giving up and
+            closing the session; 0 retries until finish().
+        backoff_base: first backoff ceiling in seconds, doubled per attempt.
+        backoff_cap: largest backoff ceiling.
+        seed: seed for the backoff jitter.
+    """
+
+    def __init__(
+        self,
+        config,
+        replay_seconds: float = DEFAULT_REPLAY_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_cap: float = DEFAULT_BACKOFF_CAP,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(config)
+        self.replay_seconds = replay_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._rng = random.Random(seed)
+        self._stopping = threading.Event()
+        self._given_up = False
+        self._lost = False
+        self._audio_lock = threading.Lock()
+        self._connected = False
+        # socket writes from send() still running; reconnects wait them out
+        self._in_flight = 0
+        self._idle = threading.Condition(self._audio_lock)
+        # (position, audio), positions in bytes from the start of the session
+        self._ring: deque = deque()
+        self._ring_bytes = 0
+        self._position = 0
+        self._acked = 0
+        self._base = 0
+        self.frame_bytes = SAMPLE_WIDTH * CHANNELS
+        self.bytes_per_second = self.frame_bytes * RATE
+
+        self.reconnects = 0
+        self.attempts = 0
+        self.replayed_seconds = 0.0
+        self.lost_seconds = 0.0
+        self.outage_seconds = 0.0
+        self.outage_max = 0.0
+
+    @property
+    def offset(self) -> float:
+        """
+        Session time, in seconds, at which the current connection's audio starts.
+        """
+        return self._base / self.bytes_per_second
+
+    def start(self, options=None, addons=None, headers=None, members=None, **kwargs) -> bool:
+        values = options.to_dict() if isinstance(options, LiveOptions) else dict(options or {})
+        channels = int(values.get("channels") or CHANNELS)
+        self.frame_bytes = SAMPLE_WIDTH * channels
+        self.bytes_per_second = self.frame_bytes * int(values.get("sample_rate") or RATE)
+        self._stopping.clear()
+        self._given_up = False
+        self._lost = False
+        with self._audio_lock:
+            self._connected = True
+        started = super().start(options, addons=addons, headers=headers, members=members, **kwargs)
+        if not started:
+            with self._audio_lock:
+                self._connected = False
+        return started
+
+    def send(self, data) -> bool:
+        """
+        Sends audio, or keeps it for replay while reconnecting. Text messages
+        (KeepAlive and the like) are dropped while disconnected.
+        """
+        if isinstance(data, str):
+            with self._audio_lock:
+                connected = self._connected
+            return super().send(data) if connected else False
+        data = bytes(data)
+        with self._audio_lock:
+            self._ring.append((self._position, data))
+            self._ring_bytes += len(data)
+            self._position += len(data)
+            limit = int(self.replay_seconds * self.bytes_per_second)
+            while self._ring and self._ring_bytes - len(self._ring[0][1]) >= limit:
+                _, dropped = self._ring.popleft()
+                self._ring_bytes -= len(dropped)
+            if not self._connected:
+                return True
+            self._in_flight += 1
+        # written outside the lock so a slow socket does not hold up acks
+        try:
+            return super().send(data)
+        finally:
+            with self._audio_lock:
+                self._in_flight -= 1
+                if not self._in_flight:
+                    self._idle.notify_all()
+
+    def finish(self) -> bool:
+        self._stopping.set()
+        return super().finish()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._audio_lock:
+            return {
+                "connected": self._connected,
+                "reconnects": self.reconnects,
+                "attempts": self.attempts,
+                "replayed_seconds": self.replayed_seconds,
+                "lost_seconds": self.lost_seconds,
+                "outage_seconds": self.outage_seconds,
+                "outage_max": self.outage_max,
+                "offset": self.offset,
+                "acked_seconds": self._acked / self.bytes_per_second,
+                "buffered_seconds": self._ring_bytes / self.bytes_per_second,
+            }
+
+    def _signal_exit(self) -> None:
+        if self._stopping.is_set() or self._given_up:
+            super()._signal_exit()
+            return
+        # the connection failed under us; _listening reconnects instead of
+        # closing the session
+        logger.warning("live connection lost, reconnecting")
+        with self._audio_lock:
+            self._connected = False
+            self._lost = True
+
+    def _listening(self) -> None:
+        while True:
+            super()._listening()
+            if self._stopping.is_set() or not self._lost:
+                return
+            if not self._reconnect():
+                if not self._stopping.is_set():
+                    logger.error("could not reconnect, closing the session")
+                    self._given_up = True
+                    self._signal_exit()
+                return
+
+    def _emit(self, event: LiveTranscriptionEvents, *args, **kwargs) -> None:
+        offset = self.offset
+        if event == LiveTranscriptionEvents.Transcript and "result" in kwargs:
+            result = kwargs["result"]
+            if offset:
+                rebase_result(result, offset)
+            if result.is_final:
+                acked = int((result.start + result.duration) * self.bytes_per_second)
+                acked -= acked % self.frame_bytes
+                with self._audio_lock:
+                    self._acked = max(self._acked, acked)
+        elif offset and event == LiveTranscriptionEvents.SpeechStarted and "speech_started" in kwargs:
+            kwargs["speech_started"].timestamp += offset
+        elif offset and event == LiveTranscriptionEvents.UtteranceEnd and "utterance_end" in kwargs:
+            kwargs["utterance_end"].last_word_end += offset
+        super()._emit(event, *args, **kwargs)
+
+    def _reconnect(self) -> bool:
+        lost_at = time.monotonic()
+        attempt = 0
+        while not self._stopping.is_set():
+            attempt += 1
+            if self.max_attempts and attempt > self.max_attempts:
+                return False
+            if self._stopping.wait(backoff_delay(attempt, self.backoff_base, self.backoff_cap, self._rng)):
+                return False
+            self.attempts += 1
+            try:
+                # start() merged the addons into self.options and the headers into config.headers
+                socket = connect(
+                    append_query_params(self.websocket_url, self.options),
+                    additional_headers=self.config.headers,
+                )
+            except Exception as e:
+                logger.warning("reconnect attempt %d failed: %s", attempt, e)
+                continue
+
+            # a send that started before the loss must not reach the new
+            # socket ahead of the replay
+            with self._audio_lock:
+                self._idle.wait_for(lambda: not self._in_flight)
+            with self._lock_send:
+                old, self._socket = self._socket, socket
+            if old is not None:
+                try:
+                    old.close()
+                except Exception:
+                    pass
+            try:
+                self._replay()
+            except websockets.exceptions.WebSocketException as e:
+                logger.warning("replay after reconnect failed: %s", e)
+                continue
+            self._restart_keep_alive()
+
+            outage = time.monotonic() - lost_at
+            self.reconnects += 1
+            self.outage_seconds += outage
+            self.outage_max = max(self.outage_max, outage)
+            self._lost = False
+            logger.warning("reconnected after %.2fs at %.2fs of audio", outage, self.offset)
+            return True
+        return False
+
+    def _replay(self) -> None:
+        """
+        Sends the unacknowledged audio to the new socket, then switches send()
+        back to sending directly.
+        """
+        with self._audio_lock:
+            start = self._acked
+            oldest = self._ring[0][0] if self._ring else self._position
+            if oldest > start:
+                self.lost_seconds += (oldest - start) / self.bytes_per_second
+                start = oldest
+            self._base = start
+        sent = start
+        while True:
+            with self._audio_lock:
+                pending = []
+                for position, data in self._ring:
+                    if position + len(data) <= sent:
+                        continue
+                    if position < sent:
+                        data = data[sent - position :]
+                    pending.append(data)
+                if not pending:
+                    self._connected = True
+                    return
+                sent = self._position
+            for data in pending:
+                self._socket.send(data)
+                self.replayed_seconds += len(data) / self.bytes_per_second
+
+    def _restart_keep_alive(self) -> None:
+        thread = getattr(self, "_keep_alive_thread", None)
+        if thread is not None and not thread.is_alive():
+            self._keep_alive_thread = threading.Thread(target=self._keep_alive)
+            self._keep_alive_thread.start()
+
+
+class ResilientLiveClient(ResilientMixin, LiveClient):
+    """
+    LiveClient that reconnects and replays unacknowledged audio.
+    """
+
+
+class ResilientFastLiveClient(ResilientMixin, FastLiveClient):
+    """
+    fast_decode.FastLiveClient that reconnects and replays unacknowledged audio.
+    """
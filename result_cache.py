@@ -0,0 +1,150 @@
+"""
+Content-addressed on-disk cache for prerecorded transcription results.
+
+Resubmitting the same audio with the same options, after a pipeline crash or
+when a dealer asks for a call again, should not cost another request. Entries
+are keyed by SHA-256 of the audio bytes (or the URL) plus the normalized
+options and addons, and hold the raw response JSON:
+
+    cache = ResultCache(".transcripts", max_bytes=2 * 1024**3, ttl=7 * 86400)
+    prerecorded = CachedPreRecordedClient(deepgram.config, cache)
+    response = prerecorded.transcribe_file({"buffer": audio}, options)  # network
+    response = prerecorded.transcribe_file({"buffer": audio}, options)  # disk
+
+Entries older than `ttl` are ignored and removed. When the cache grows past
+`max_bytes`, the least recently used entries are evicted (see disk_lru).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Union
+
+from deepgram import PrerecordedOptions, PrerecordedResponse
+
+from disk_lru import DiskLRU
+from http_pool import HTTPPool, PooledPreRecordedClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024**3
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def normalize_options(options: Optional[Union[Dict, PrerecordedOptions]], addons: Optional[Dict] = None) -> str:
+    """
+    Canonical JSON for the request parameters: None values dropped, keys sorted.
+    """
+    if isinstance(options, PrerecordedOptions):
+        options = json.loads(options.to_json())
+    merged = {key: value for key, value in (options or {}).items() if value is not None}
+    merged.update({key: value for key, value in (addons or {}).items() if value is not None})
+    return json.dumps(merged, sort_keys=True, separators=(",", ":"))
+
+
+def source_digest(source: Dict) -> Optional[str]:
+    """
+    SHA-256 of a UrlSource, BufferSource or ReadStreamSource, or of
+    `{"path": ...}` for a file on disk. Streams must come from a file (open()
+    or FileUpload); anything else returns None and is not cached.
+    """
+    digest = hashlib.sha256()
+    if "url" in source:
+        digest.update(b"url:" + source["url"].encode())
+        return digest.hexdigest()
+    if "buffer" in source:
+        digest.update(b"audio:")
+        digest.update(source["buffer"])
+        return digest.hexdigest()
+    path = source.get("path")
+    if path is None:
+        stream = source.get("stream")
+        path = getattr(stream, "path", None) or getattr(stream, "name", None)
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return None
+    digest.update(b"audio:")
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of raw response JSON in `directory`.
+
+    Args:
+        directory: where entries are stored; created if missing.
+        max_bytes: total size of stored entries before LRU eviction.
+        ttl: seconds an entry stays valid, None to keep until evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = None):
+        self.entries = DiskLRU(directory, ".json", max_bytes, ttl)
+
+    def key(self, source: Dict, options=None, addons: Optional[Dict] = None) -> Optional[str]:
+        digest = source_digest(source)
+        if digest is None:
+            return None
+        return hashlib.sha256(f"{digest}:{normalize_options(options, addons)}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Raw JSON for `key`, or None on a miss or an expired entry.
+        """
+        path = self.entries.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            self.entries.discard(key)
+            return None
+
+    def put(self, key: str, raw: str) -> None:
+        data = raw.encode("utf-8")
+        self.entries.store(key, lambda f: f.write(data))
+
+    def metrics(self) -> Dict:
+        return self.entries.metrics()
+
+
+class CachedPreRecordedClient(PooledPreRecordedClient):
+    """
+    PooledPreRecordedClient that answers `transcribe_file` and
+    `transcribe_url` from a ResultCache when it can. Callback requests and
+    streams that cannot be hashed always go to the network.
+    """
+
+    def __init__(self, config, cache: ResultCache, pool: Optional[HTTPPool] = None):
+        super().__init__(config, pool)
+        self.cache = cache
+        self._local = threading.local()
+
+    def post(self, *args, **kwargs) -> str:
+        text = super().post(*args, **kwargs)
+        self._local.last_text = text
+        return text
+
+    def transcribe_url(self, source, options=None, addons=None, **kwargs) -> PrerecordedResponse:
+        return self._cached(super().transcribe_url, source, options, addons, **kwargs)
+
+    def transcribe_file(self, source, options=None, addons=None, **kwargs) -> PrerecordedResponse:
+        return self._cached(super().transcribe_file, source, options, addons, **kwargs)
+
+    def _cached(self, transcribe, source, options, addons, **kwargs) -> PrerecordedResponse:
+        callback = options.get("callback") if isinstance(options, dict) else getattr(options, "callback", None)
+        key = None if callback else self.cache.key(source, options, addons)
+        if key is not None:
+            raw = self.cache.get(key)
+            if raw is not None:
+                return PrerecordedResponse.from_json(raw)
+
+        self._local.last_text = None
+        response = transcribe(source, options, addons, **kwargs)
+        if key is not None and self._local.last_text is not None:
+            self.cache.put(key, self._local.last_text)
+        return response
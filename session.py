@@ -0,0 +1,557 @@
+"""
+Per-call transcription state and a manager that runs many calls per process.
+
+A TranscriptionSession holds everything that used to be module globals in
+microphone.py (is_finals, current_speaker, conversation_id, speakers), so any
+number of sessions can share one interpreter, one NIO client and one delivery
+pipeline.
+
+The NIO conversation is created in the background once the Deepgram
+connection is open, concurrently with audio capture, instead of inside the Open
+handler where it held up `LiveClient.start()`. Messages produced before the conversation id
+is known are buffered by the session and handed to the batcher once it is.
+
+Every message gets an id from the session's external id, its sequence number
+and its content (nio.message_id), and a timestamp derived from the Deepgram
+word times, so rebuilding or resending a message never changes its identity.
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from deepgram import DeepgramClient, LiveTranscriptionEvents, Microphone
+
+from audio_sender import AudioSender
+from batching import MessageBatcher
+from nio import (
+    build_add_message_payload,
+    build_conversation_payload,
+    end_conversation_payload,
+    iso_timestamp,
+    message_id,
+    new_external_id,
+)
+from vad import VoiceGate
+
+logger = logging.getLogger(__name__)
+
+# how long Close waits for a conversation that is still being created
+DEFAULT_CONVERSATION_TIMEOUT = 30.0
+
+
+class SessionMetrics:
+    """
+    Counters for a single session. `snapshot()` is safe to call from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.transcripts = 0
+        self.is_finals = 0
+        self.speech_finals = 0
+        self.utterance_ends = 0
+        self.messages = 0
+        self.buffered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.conversation_seconds = 0.0
+
+    def incr(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def set(self, name: str, value: Any) -> None:
+        with self._lock:
+            setattr(self, name, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime": time.monotonic() - self.started_at,
+                "transcripts": self.transcripts,
+                "is_finals": self.is_finals,
+                "speech_finals": self.speech_finals,
+                "utterance_ends": self.utterance_ends,
+                "messages": self.messages,
+                "buffered": self.buffered,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "conversation_seconds": self.conversation_seconds,
+            }
+
+
+class TranscriptionSession:
+    """
+    State and event handlers for one live call.
+
+    Args:
+        nio: NIOClient or AsyncNIOClient used to create the conversation.
+        batcher: where this session's messages are queued for posting.
+        user_events: which events add messages, see get_user_event_selection().
+        name: label printed in front of every line; useful with many sessions.
+        conversation_timeout: seconds the Close handler waits for a
+            conversation that is still being created.
+    """
+
+    def __init__(
+        self,
+        nio,
+        batcher: MessageBatcher,
+        user_events: Dict[str, bool],
+        name: Optional[str] = None,
+        conversation_timeout: float = DEFAULT_CONVERSATION_TIMEOUT,
+    ):
+        self.nio = nio
+        self.batcher = batcher
+        self.user_events = user_events
+        self.name = name
+        self.conversation_timeout = conversation_timeout
+        self.metrics = SessionMetrics()
+
+        # We will collect the is_final=true messages here so we can use them when the person finishes speaking
+        self.is_finals: List[str] = []
+        self.current_speaker = None
+        self.conversation_id = None
+        self.speakers = []
+
+        # identity of this call's messages, known before NIO answers
+        self.external_id = new_external_id()
+        self.sequence = 0
+        # wall clock time of audio position 0, for the message timestamps
+        self.audio_started: Optional[datetime] = None
+        # maps Deepgram audio time to captured audio time when audio is gated,
+        # e.g. VoiceGate.capture_offset
+        self.audio_clock: Optional[Callable[[float], float]] = None
+        # audio time of the first word of the is_finals collected so far
+        self._utterance_start: Optional[float] = None
+
+        # payloads waiting for the conversation id, guarded by _conversation_lock
+        self._pending: List[Dict] = []
+        self._conversation_lock = threading.Lock()
+        self._conversation_done = threading.Event()
+        self._conversation_started = False
+        self._conversation_task = None
+
+    def register(self, dg_connection) -> None:
+        """
+        Subscribes this session to a LiveClient or AsyncLiveClient.
+        """
+        handlers = {
+            LiveTranscriptionEvents.Open: self.on_open,
+            LiveTranscriptionEvents.Transcript: self.on_message,
+            LiveTranscriptionEvents.Metadata: self.on_metadata,
+            LiveTranscriptionEvents.SpeechStarted: self.on_speech_started,
+            LiveTranscriptionEvents.UtteranceEnd: self.on_utterance_end,
+            LiveTranscriptionEvents.Close: self.on_close,
+            LiveTranscriptionEvents.Error: self.on_error,
+            LiveTranscriptionEvents.Unhandled: self.on_unhandled,
+        }
+        # listen.asynclive.v("1") returns the v1 class, not the deepgram.AsyncLiveClient alias
+        if inspect.iscoroutinefunction(dg_connection.start):
+            handlers = {event: _as_coroutine(h) for event, h in handlers.items()}
+            handlers[LiveTranscriptionEvents.Close] = self.on_close_async
+        for event, handler in handlers.items():
+            dg_connection.on(event, handler)
+
+    def print(self, line: str) -> None:
+        if self.name is None:
+            print(line)
+        else:
+            print(f"[{self.name}] {line}")
+
+    def start_conversation(self) -> None:
+        """
+        Starts creating the NIO conversation in the background and returns at
+        once. The Open handler calls it, so a conversation is only created for
+        a session that actually connected. With an AsyncNIOClient it must be
+        called on the event loop.
+        """
+        with self._conversation_lock:
+            if self._conversation_started:
+                return
+            self._conversation_started = True
+        if inspect.iscoroutinefunction(self.nio.create_conversation):
+            self._conversation_task = asyncio.ensure_future(self._create_conversation_async())
+        else:
+            threading.Thread(target=self._create_conversation, name=f"nio-conversation-{self.name}", daemon=True).start()
+
+    def wait_conversation(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the conversation was created or failed to be.
+        """
+        return self._conversation_done.wait(timeout)
+
+    async def wait_conversation_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        wait_conversation() for sessions using an AsyncNIOClient.
+        """
+        if self._conversation_task is None:
+            return self._conversation_done.is_set()
+        # asyncio.wait does not cancel the creation if it times out
+        done, _ = await asyncio.wait({self._conversation_task}, timeout=timeout)
+        return bool(done)
+
+    def on_open(self, client, open=None, **kwargs):
+        self.print(f"Connection Open")
+        # audio is sent from here on; Deepgram's word times count from this point
+        if self.audio_started is None:
+            self.audio_started = datetime.now(timezone.utc)
+        self.start_conversation()
+
+    def on_message(self, client, result, **kwargs):
+        self.metrics.incr("transcripts")
+        sentence = result.channel.alternatives[0].transcript
+        # Audio time the result starts at, from its first word when there is one
+        start = result.start
+        # Check if speaker exist on the current message
+        if result.channel.alternatives and result.channel.alternatives[0].words:
+            self.current_speaker = result.channel.alternatives[0].words[0].speaker
+            start = result.channel.alternatives[0].words[0].start
+            # speakers = [word.speaker for word in result.channel.alternatives[0].words]
+
+        if len(sentence) == 0:
+            return
+
+        if result.is_final:
+            self.metrics.incr("is_finals")
+            # We need to collect these and concatenate them together when we get a speech_final=true
+            # See docs: https://developers.deepgram.com/docs/understand-endpointing-interim-results
+            # the utterance starts with its first collected is_final, so no
+            # start can outlive the is_finals it belongs to
+            if not self.is_finals:
+                self._utterance_start = start
+            self.is_finals.append(sentence)
+
+            # Speech Final means we have detected sufficent silence to consider this end of speech
+            # Speech final is the lowest latency result as it triggers as soon an the endpointing value has triggered
+            if result.speech_final:
+                self.metrics.incr("speech_finals")
+                utterance = " ".join(self.is_finals)
+                line = f"Speaker - {self.current_speaker} Speech Final - {utterance}"
+                self.print(line)
+                utterance_start = self._utterance_start
+                # Reset Is Finals Event
+                self._clear_utterance()
+                # Reset current_speaker
+                self.current_speaker = None
+                # Reset list of speakers in a sentence
+                self.speakers = []
+                self.add_to_conversation("speech_final", line, utterance_start)
+                # End of speech is a natural boundary, post whatever is buffered
+                self._flush()
+            else:
+                # These are useful if you need real time captioning and update what the Interim Results produced
+                line = f"Speaker - {self.current_speaker} Is Final - {sentence}"
+                self.print(line)
+                self.add_to_conversation("is_final", line, start)
+        else:
+            line = f"Speaker - {self.current_speaker} - Interim Results - {sentence}"
+            # These are useful if you need real time captioning of what is being spoken
+            self.print(line)
+            self.add_to_conversation("interim_results", line, start)
+
+    def on_metadata(self, client, metadata, **kwargs):
+        self.print(f"Metadata: {metadata}")
+
+    def on_speech_started(self, client, speech_started, **kwargs):
+        self.print(f"Speech Started")
+
+    def on_utterance_end(self, client, utterance_end, **kwargs):
+        self.metrics.incr("utterance_ends")
+        self.print(f"Utterance End")
+        if len(self.is_finals) > 0:
+            utterance = " ".join(self.is_finals)
+            line = f"Utterance End: {utterance}"
+            self.print(line)
+            utterance_start = self._utterance_start
+            self._clear_utterance()
+            self.add_to_conversation("utterance_end", line, utterance_start)
+        self._flush()
+
+    def on_close(self, client, close=None, **kwargs):
+        self.print(f"Connection Closed")
+        # messages buffered while the conversation is created are posted on
+        # resolution, which has to happen before the batcher is closed
+        if not self.wait_conversation(self.conversation_timeout):
+            logger.warning("%s: conversation still not created at close", self.name)
+        self._end_conversation()
+
+    async def on_close_async(self, client, close=None, **kwargs):
+        self.print(f"Connection Closed")
+        if not await self.wait_conversation_async(self.conversation_timeout):
+            logger.warning("%s: conversation still not created at close", self.name)
+        self._end_conversation()
+
+    def on_error(self, client, error, **kwargs):
+        self.metrics.incr("errors")
+        self.print(f"Handled Error: {error}")
+
+    def on_unhandled(self, client, unhandled, **kwargs):
+        self.print(f"Unhandled Websocket Message: {unhandled}")
+
+    def add_to_conversation(self, event: str, line: str, start: Optional[float] = None) -> None:
+        """
+        Adds a message to the conversation based on user preferences. `start`
+        is the audio time in seconds at which the message's speech began.
+        """
+        if not self.user_events[event]:
+            return
+        self.print("Adding message to conversation!")
+        self.metrics.incr("messages")
+        timestamp = None
+        if start is not None and self.audio_started is not None:
+            if self.audio_clock is not None:
+                start = self.audio_clock(start)
+            timestamp = iso_timestamp(self.audio_started + timedelta(seconds=start))
+        with self._conversation_lock:
+            # numbered under the lock, so sequence order is batcher order
+            self.sequence += 1
+            payload = build_add_message_payload(
+                line, id=message_id(self.external_id, self.sequence, line), timestamp=timestamp
+            )
+            if self.conversation_id is not None:
+                # under the lock, so these cannot overtake the buffered messages
+                self.batcher.add(payload, self.conversation_id)
+            elif self._conversation_done.is_set():
+                # creating the conversation failed, there is nowhere to post
+                self.metrics.incr("dropped")
+            else:
+                self._pending.append(payload)
+                self.metrics.incr("buffered")
+
+    def _flush(self) -> None:
+        # buffered messages are flushed when the conversation id resolves
+        with self._conversation_lock:
+            if self.conversation_id is not None:
+                self.batcher.flush(self.conversation_id)
+
+    def _clear_utterance(self) -> None:
+        self.is_finals = []
+        self._utterance_start = None
+
+    def _end_conversation(self) -> None:
+        self._flush()
+        if self.conversation_id is not None:
+            end_conversation_payload(self.conversation_id)
+        # conversation_id is kept, results still arriving after Close belong to it
+        self.print("Conversation Ended!")
+
+    def _create_conversation(self) -> None:
+        started = time.monotonic()
+        try:
+            response = self.nio.create_conversation(build_conversation_payload(self.external_id))
+        except Exception as e:
+            logger.error("%s: create_conversation failed: %s", self.name, e)
+            response = None
+        self._set_conversation(response, time.monotonic() - started)
+
+    async def _create_conversation_async(self) -> None:
+        started = time.monotonic()
+        try:
+            response = await self.nio.create_conversation(build_conversation_payload(self.external_id))
+        except Exception as e:
+            logger.error("%s: create_conversation failed: %s", self.name, e)
+            response = None
+        self._set_conversation(response, time.monotonic() - started)
+
+    def _set_conversation(self, response: Optional[Dict], took: float) -> None:
+        self.metrics.set("conversation_seconds", took)
+        conversation_id = response.get("id") if isinstance(response, dict) else None
+        with self._conversation_lock:
+            pending, self._pending = self._pending, []
+            if conversation_id is None:
+                self.metrics.incr("errors")
+                self.metrics.incr("dropped", len(pending))
+                self.print("Could not create conversation")
+            else:
+                self.conversation_id = conversation_id
+                self.print(f"conversation_id = {conversation_id!r}")
+                for payload in pending:
+                    self.batcher.add(payload, conversation_id)
+                if pending:
+                    self.batcher.flush(conversation_id)
+            self._conversation_done.set()
+
+
+def _as_coroutine(handler: Callable) -> Callable:
+    if inspect.iscoroutinefunction(handler):
+        return handler
+
+    async def wrapper(*args, **kwargs):
+        return handler(*args, **kwargs)
+
+    return wrapper
+
+
+class SessionManager:
+    """
+    Runs many TranscriptionSessions concurrently, each with its own LiveClient
+    and NIO conversation, sharing one NIO client and batching pipeline.
+
+    Args:
+        deepgram: client used to open one `listen.live` connection per session.
+        nio: NIOClient shared by every session.
+        batcher: shared MessageBatcher feeding the delivery pool.
+        user_events: which events add messages.
+        options: LiveOptions used for every session.
+        addons: extra query parameters for every session.
+        source_factory: called as `source_factory(push_callback)` to build the
+            audio source for a session; must provide `start()` and `finish()`
+            like `deepgram.Microphone`.
+        client_class: LiveClient subclass to connect with, e.g.
+            fast_decode.FastLiveClient; defaults to `deepgram.listen.live`.
+        vad: keyword arguments for vad.VoiceGate; when given, every session's
+            audio passes through a gate so only speech is sent.
+        sender: keyword arguments for audio_sender.AudioSender; when given,
+            every session sends from its own thread behind a bounded queue
+            instead of on the capture thread.
+        pool: live_pool.LivePool to check pre-opened connections out of
+            instead of connecting when the session starts; `client_class` is
+            then the pool's.
+    """
+
+    def __init__(
+        self,
+        deepgram: DeepgramClient,
+        nio,
+        batcher: MessageBatcher,
+        user_events: Dict[str, bool],
+        options,
+        addons: Optional[Dict] = None,
+        source_factory: Callable[[Callable], Any] = Microphone,
+        client_class: Optional[type] = None,
+        vad: Optional[Dict] = None,
+        sender: Optional[Dict] = None,
+        pool=None,
+    ):
+        self.deepgram = deepgram
+        self.nio = nio
+        self.batcher = batcher
+        self.user_events = user_events
+        self.options = options
+        self.addons = addons
+        self.source_factory = source_factory
+        self.client_class = client_class
+        self.vad = vad
+        self.sender = sender
+        self.pool = pool
+        self.sessions: Dict[str, TranscriptionSession] = {}
+        self._connections: Dict[str, Any] = {}
+        self._sources: Dict[str, Any] = {}
+        self._senders: Dict[str, AudioSender] = {}
+        # per session, the stages that report metrics(); kept after stop_session
+        self._metered: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def start_session(self, name: Optional[str] = None) -> Optional[TranscriptionSession]:
+        """
+        Opens a connection and its audio source. Returns None if the connection
+        could not be established.
+        """
+        with self._lock:
+            self._counter += 1
+            if name is None:
+                name = f"session-{self._counter}"
+        session = TranscriptionSession(self.nio, self.batcher, self.user_events, name=name)
+        addons = dict(self.addons) if self.addons is not None else None
+        if self.pool is not None:
+            dg_connection = self.pool.checkout(self.options, addons, register=session.register)
+            if dg_connection is None:
+                logger.error("%s: failed to connect to Deepgram", name)
+                return None
+        else:
+            if self.client_class is None:
+                dg_connection = self.deepgram.listen.live.v("1")
+            else:
+                dg_connection = self.client_class(self.deepgram.config)
+            session.register(dg_connection)
+            if dg_connection.start(self.options, addons=addons) is False:
+                logger.error("%s: failed to connect to Deepgram", name)
+                return None
+        push = dg_connection.send
+        sender = None
+        if self.sender is not None:
+            sender = AudioSender(push, **self.sender)
+            sender.start()
+            push = sender.push
+        gate = None
+        if self.vad is not None:
+            gate = VoiceGate(push, **self.vad)
+            session.audio_clock = gate.capture_offset
+            push = gate.push
+        source = self.source_factory(push)
+        source.start()
+        with self._lock:
+            self.sessions[name] = session
+            self._connections[name] = dg_connection
+            self._sources[name] = source
+            if sender is not None:
+                self._senders[name] = sender
+            stages = {"connection": dg_connection, "sender": sender, "vad": gate, "capture": source}
+            self._metered[name] = {key: stage for key, stage in stages.items() if hasattr(stage, "metrics")}
+        return session
+
+    def start(self, count: int) -> List[TranscriptionSession]:
+        """
+        Starts `count` sessions in parallel.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, count)) as pool:
+            started = list(pool.map(lambda _: self.start_session(), range(count)))
+        return [session for session in started if session is not None]
+
+    def stop_session(self, name: str) -> None:
+        with self._lock:
+            # sources and senders are kept so their metrics() outlive the session
+            source = self._sources.get(name)
+            dg_connection = self._connections.pop(name, None)
+            sender = self._senders.get(name)
+        if dg_connection is None:
+            # already stopped
+            return
+        if source is not None:
+            source.finish()
+        if sender is not None:
+            # send what was captured before closing the stream
+            sender.finish()
+        if dg_connection is not None:
+            dg_connection.finish()
+
+    def wait(self) -> None:
+        """
+        Blocks until every session's audio source has run out of audio. Only
+        finite sources such as the file replays in audio_sources provide `wait()`.
+        """
+        with self._lock:
+            sources = list(self._sources.values())
+        for source in sources:
+            if hasattr(source, "wait"):
+                source.wait()
+
+    def finish(self) -> None:
+        """
+        Stops every session in parallel.
+        """
+        with self._lock:
+            names = list(self._connections)
+        if not names:
+            return
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            list(pool.map(self.stop_session, names))
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            sessions = dict(self.sessions)
+            metered = dict(self._metered)
+        metrics = {name: session.metrics.snapshot() for name, session in sessions.items()}
+        for name, stages in metered.items():
+            for key, stage in stages.items():
+                metrics[name][key] = stage.metrics()
+        return metrics
@@ -0,0 +1,236 @@
+"""
+Persistent cache of synthesized phrases for text-to-speech.
+
+Agents repeat the same greetings and disclaimers all day. PhraseCache stores
+each synthesized phrase on disk, keyed by the normalized text and the
+SpeakOptions fields that change the audio (model, encoding, container,
+sample_rate, bit_rate). Hits are served from an mmap, so repeated phrases cost
+no request and no copy into the Python heap. Entries are evicted least recently
+used first once `max_bytes` is exceeded (see disk_lru).
+
+    cache = PhraseCache(".phrases", max_bytes=512 * 1024**2)
+    speak = CachedSpeakClient(deepgram.config, cache, pool)
+    speak.prewarm(["Thanks for calling Smith Toyota.", ...], options)
+    for chunk in speak.speak_chunks({"text": "Thanks for calling Smith Toyota."}, options):
+        player.write(chunk)
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional
+
+from deepgram import DeepgramClient, DeepgramClientOptions, SpeakOptions
+from dotenv import load_dotenv
+
+from disk_lru import DiskLRU
+from http_pool import HTTPPool
+from speak_stream import DEFAULT_CHUNK_SIZE, StreamingSpeakClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024**2
+AUDIO_OPTIONS = ("model", "encoding", "container", "sample_rate", "bit_rate")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    NFKC with runs of whitespace collapsed. Case and punctuation are kept
+    because they change the prosody.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def audio_options(options) -> Dict:
+    """
+    The SpeakOptions fields that affect the synthesized audio.
+    """
+    if isinstance(options, SpeakOptions):
+        options = json.loads(options.to_json())
+    options = options or {}
+    return {name: options[name] for name in AUDIO_OPTIONS if options.get(name) is not None}
+
+
+class CachedAudio:
+    """
+    A cache hit, mapped read-only. Iterate for memoryview chunks; close (or use
+    `with`) to unmap.
+    """
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def __iter__(self) -> Iterator[memoryview]:
+        for offset in range(0, len(self._view), self.chunk_size):
+            yield self._view[offset : offset + self.chunk_size]
+
+    def close(self) -> None:
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # the caller still holds chunks; the mapping goes when they do
+            pass
+
+    def __enter__(self) -> "CachedAudio":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PhraseCache:
+    """
+    Disk-backed LRU of synthesized audio.
+
+    Args:
+        directory: where audio files are stored; created if missing.
+        max_bytes: total audio kept before least recently used phrases are
+            evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.entries = DiskLRU(directory, ".audio", max_bytes)
+
+    def key(self, text: str, options=None) -> str:
+        material = json.dumps([normalize_text(text), audio_options(options)], sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[CachedAudio]:
+        path = self.entries.lookup(key)
+        if path is None:
+            return None
+        try:
+            return CachedAudio(path, chunk_size)
+        except (FileNotFoundError, ValueError):
+            # removed underneath us, or an empty file that cannot be mapped
+            self.entries.discard(key)
+            return None
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        """
+        Stores audio from `chunks`. Nothing is stored if iterating raises.
+        """
+
+        def write(f):
+            for chunk in chunks:
+                f.write(chunk)
+
+        return self.entries.store(key, write)
+
+    def metrics(self) -> Dict:
+        return self.entries.metrics()
+
+
+class CachedSpeakClient(StreamingSpeakClient):
+    """
+    StreamingSpeakClient that serves repeated phrases from a PhraseCache and
+    records new ones as they stream.
+    """
+
+    def __init__(self, config, cache: PhraseCache, pool: Optional[HTTPPool] = None):
+        super().__init__(config, pool)
+        self.cache = cache
+
+    def speak_chunks(self, source: Dict, options=None, chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs) -> Iterator[bytes]:
+        """
+        Yields audio for `source["text"]`: memoryview slices of the cached file
+        on a hit, otherwise chunks as they arrive from `v1/speak` while they
+        are written to the cache. A response that is not read to the end is
+        not cached.
+        """
+        key = self.cache.key(source["text"], options)
+        audio = self.cache.get(key, chunk_size)
+        if audio is not None:
+            with audio:
+                yield from audio
+            return
+
+        with self.iter_stream(source, options, chunk_size=chunk_size, **kwargs) as response:
+            yield from self._record(key, response)
+
+    def _record(self, key: str, response) -> Iterator[bytes]:
+        # phrases are short, so the audio is held until the response completes
+        chunks = []
+        for chunk in response:
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            self.cache.put(key, chunks)
+
+    def prewarm(self, phrases: Iterable[str], options=None, workers: int = 4) -> Dict:
+        """
+        Synthesizes every phrase not already cached, `workers` at a time.
+        Returns counts of phrases that were cached, fetched and failed.
+        """
+        counts = {"cached": 0, "fetched": 0, "failed": 0}
+        missing = []
+        for text in phrases:
+            if self.cache.key(text, options) in self.cache:
+                counts["cached"] += 1
+            else:
+                missing.append(text)
+
+        def fetch(text: str) -> bool:
+            try:
+                key = self.cache.key(text, options)
+                with self.iter_stream({"text": text}, options) as response:
+                    self.cache.put(key, response)
+                return True
+            except Exception as e:
+                logger.error("prewarm failed for %r: %s", text[:40], e)
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for ok in pool.map(fetch, missing):
+                counts["fetched" if ok else "failed"] += 1
+        return counts
+
+    def metrics(self) -> Dict:
+        return self.cache.metrics()
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Prewarm the text-to-speech phrase cache")
+    parser.add_argument("phrases", help="text file with one phrase per line")
+    parser.add_argument("--cache", default=".phrases")
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument("--model", default="aura-asteria-en")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--deepgram-url", default=os.getenv("DEEPGRAM_URL", ""))
+    args = parser.parse_args()
+
+    with open(args.phrases, encoding="utf-8") as f:
+        phrases = [line.strip() for line in f if line.strip()]
+
+    deepgram = DeepgramClient(os.getenv("DEEPGRAM_API_KEY", ""), DeepgramClientOptions(url=args.deepgram_url))
+    with HTTPPool(max_connections=args.workers) as pool:
+        speak = CachedSpeakClient(deepgram.config, PhraseCache(args.cache, args.max_bytes), pool)
+        counts = speak.prewarm(phrases, SpeakOptions(model=args.model), workers=args.workers)
+        metrics = speak.metrics()
+    print(
+        f"{counts['fetched']} fetched, {counts['cached']} already cached, {counts['failed']} failed; "
+        f"cache holds {metrics['entries']} phrases, {metrics['bytes']} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Sentence-pipelined text-to-speech for long agent replies.
+
+A long reply sent as one `v1/speak` request cannot start playing until the
+service has started synthesizing all of it. PipelinedSpeaker splits the text
+at sentence boundaries, runs up to `max_in_flight` streaming requests at once
+and yields the audio in sentence order. The first sentence streams straight
+through while later ones are synthesized in the background, so time to first
+audio depends on the first sentence rather than the whole reply:
+
+    speaker = PipelinedSpeaker(StreamingSpeakClient(deepgram.config, pool), options)
+    for chunk in speaker.speak(reply):
+        player.write(chunk)
+
+Use an encoding whose segments can simply be appended (mp3, or linear16 with
+`container="none"`); a wav container would repeat its header per sentence.
+"""
+
+import argparse
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
+
+from deepgram import DeepgramClient, DeepgramClientOptions, SpeakOptions
+from dotenv import load_dotenv
+
+from http_pool import HTTPPool
+from speak_stream import StreamingSpeakClient
+
+DEFAULT_MAX_IN_FLIGHT = 3
+# Deepgram rejects speak requests over 2000 characters
+MAX_CHARS = 2000
+# fragments shorter than this are joined to the next sentence
+MIN_CHARS = 20
+
+# closing quotes and brackets stay with their sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|(?<=[.!?][\"')\]][\"')\]])\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+_DONE = object()
+
+
+def split_sentences(text: str, min_chars: int = MIN_CHARS, max_chars: int = MAX_CHARS) -> List[str]:
+    """
+    Splits at sentence ends, joins fragments shorter than `min_chars` ("Hi.",
+    "Mr.") to what follows, and breaks sentences longer than `max_chars` at
+    clause boundaries, then at spaces.
+    """
+    sentences = []
+    pending = ""
+    for part in _SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {part}".strip() if pending else part.strip()
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences and len(sentences[-1]) + len(pending) < max_chars:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+
+    bounded = []
+    for sentence in sentences:
+        bounded.extend(_split_long(sentence, max_chars))
+    return bounded
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    parts = _CLAUSE_END.split(text)
+    if len(parts) == 1:
+        parts = text.split()
+    if len(parts) == 1:
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+    pieces = []
+    current = ""
+    for part in parts:
+        for piece in _split_long(part, max_chars):
+            candidate = f"{current} {piece}".strip()
+            if len(candidate) <= max_chars:
+                current = candidate
+                continue
+            if current:
+                pieces.append(current)
+            current = piece
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class PipelinedSpeaker:
+    """
+    Speaks long texts as concurrent per-sentence requests, reassembled in order.
+
+    Args:
+        client: StreamingSpeakClient used for every sentence; give it an
+            HTTPPool with at least `max_in_flight` connections.
+        options: SpeakOptions or dict sent with every sentence.
+        max_in_flight: sentences being synthesized at once.
+    """
+
+    def __init__(self, client: StreamingSpeakClient, options=None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.client = client
+        self.options = options
+        self.max_in_flight = max_in_flight
+        self.last_metrics: Dict = {}
+
+    def speak(self, text: str) -> Iterator[bytes]:
+        """
+        Yields audio chunks in sentence order. Closing the generator early
+        stops requests that have not started and abandons the rest.
+        """
+        sentences = split_sentences(text)
+        started = time.perf_counter()
+        cancelled = threading.Event()
+        outputs = [queue.Queue() for _ in sentences]
+        metrics = {
+            "sentences": len(sentences),
+            "first_audio": None,
+            "elapsed": None,
+            "bytes": 0,
+            "ttfb": [None] * len(sentences),
+        }
+        self.last_metrics = metrics
+
+        def synthesize(index: int) -> None:
+            out = outputs[index]
+            if cancelled.is_set():
+                out.put(_DONE)
+                return
+            try:
+                with self.client.iter_stream({"text": sentences[index]}, self.options) as audio:
+                    for chunk in audio:
+                        if cancelled.is_set():
+                            break
+                        out.put(chunk)
+                metrics["ttfb"][index] = audio.ttfb
+                out.put(_DONE)
+            except Exception as e:
+                out.put(e)
+
+        pool = ThreadPoolExecutor(max_workers=max(1, self.max_in_flight), thread_name_prefix="speak")
+        try:
+            # the pool runs them in submission order, at most max_in_flight at a time
+            for index in range(len(sentences)):
+                pool.submit(synthesize, index)
+            for out in outputs:
+                while True:
+                    item = out.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if metrics["first_audio"] is None:
+                        metrics["first_audio"] = time.perf_counter() - started
+                    metrics["bytes"] += len(item)
+                    yield item
+            metrics["elapsed"] = time.perf_counter() - started
+        finally:
+            cancelled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Speak a long text sentence by sentence")
+    parser.add_argument("text")
+    parser.add_argument("--out", default="speak.mp3")
+    parser.add_argument("--model", default="aura-asteria-en")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument("--compare", action="store_true", help="also time the same text as a single request")
+    parser.add_argument("--deepgram-url", default=os.getenv("DEEPGRAM_URL", ""))
+    args = parser.parse_args()
+    if not args.text.strip():
+        parser.error("text is empty")
+
+    deepgram = DeepgramClient(os.getenv("DEEPGRAM_API_KEY", ""), DeepgramClientOptions(url=args.deepgram_url))
+    options = SpeakOptions(model=args.model)
+    with HTTPPool(max_connections=args.max_in_flight + 1) as pool:
+        client = StreamingSpeakClient(deepgram.config, pool)
+        speaker = PipelinedSpeaker(client, options, max_in_flight=args.max_in_flight)
+        with open(args.out, "wb") as f:
+            for chunk in speaker.speak(args.text):
+                f.write(chunk)
+        metrics = speaker.last_metrics
+        print(
+            f"pipelined: {metrics['sentences']} sentences, first audio {metrics['first_audio'] * 1000:.0f} ms, "
+            f"done {metrics['elapsed'] * 1000:.0f} ms -> {args.out}"
+        )
+        if args.compare:
+            with client.iter_stream({"text": args.text}, options) as audio:
+                for _ in audio:
+                    pass
+            print(f"single:    first audio {audio.ttfb * 1000:.0f} ms, done {audio.elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
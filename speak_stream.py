@@ -0,0 +1,188 @@
+"""
+Streaming text-to-speech.
+
+`SpeakClient.stream` goes through `post_file`, which waits for the whole
+response and wraps it in a BytesIO, so the first audio is only available once
+synthesis has finished. StreamingSpeakClient.iter_stream hands audio chunks to
+the caller as they arrive, so playback or a file write can start on the first
+bytes:
+
+    speak = StreamingSpeakClient(deepgram.config, pool)
+    with speak.iter_stream({"text": text}, SpeakOptions(model="aura-asteria-en")) as audio:
+        for chunk in audio:
+            player.write(chunk)
+    print(audio.metrics())   # ttfb, headers, elapsed, bytes
+
+`save_stream()` writes to a file the same way.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, Optional, Union
+
+import httpx
+from deepgram import DeepgramClient, DeepgramClientOptions, SpeakOptions
+from deepgram.clients.speak.errors import DeepgramError, DeepgramTypeError
+from dotenv import load_dotenv
+
+from http_pool import HTTPPool, PooledSpeakClient, build_headers, build_url, dg_header, raise_api_error
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class SpeakStream:
+    """
+    One streaming `v1/speak` response. Use as a context manager and iterate
+    for audio chunks; the response metadata is available once it is entered.
+
+    Timings are in seconds from the moment the request was sent:
+    `headers` until the response headers arrived, `ttfb` until the first audio
+    byte, `elapsed` until the last one.
+    """
+
+    def __init__(self, client: httpx.Client, url: str, headers: Dict, body: Dict, timeout, chunk_size: int):
+        self._client = client
+        self._url = url
+        self._headers = headers
+        self._body = body
+        self._timeout = timeout
+        self.chunk_size = chunk_size
+        self._context = None
+        self.response: Optional[httpx.Response] = None
+        self.started = None
+        self.headers = None
+        self.ttfb = None
+        self.elapsed = None
+        self.bytes = 0
+
+    def __enter__(self) -> "SpeakStream":
+        self.started = time.perf_counter()
+        self._context = self._client.stream(
+            "POST", self._url, headers=self._headers, json=self._body, timeout=self._timeout
+        )
+        self.response = self._context.__enter__()
+        self.headers = time.perf_counter() - self.started
+        try:
+            self.response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            self.response.read()
+            self.close()
+            raise_api_error(e)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._context is not None:
+            context, self._context = self._context, None
+            context.__exit__(None, None, None)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.response.iter_bytes(self.chunk_size):
+            if self.ttfb is None:
+                self.ttfb = time.perf_counter() - self.started
+            self.bytes += len(chunk)
+            yield chunk
+        self.elapsed = time.perf_counter() - self.started
+
+    def _header(self, item: str) -> Optional[str]:
+        return dg_header(self.response.headers, item)
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return self._header("content-type")
+
+    @property
+    def request_id(self) -> Optional[str]:
+        return self._header("request-id")
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return self._header("model-name")
+
+    @property
+    def model_uuid(self) -> Optional[str]:
+        return self._header("model-uuid")
+
+    @property
+    def characters(self) -> Optional[str]:
+        return self._header("char-count")
+
+    def metrics(self) -> Dict:
+        return {"headers": self.headers, "ttfb": self.ttfb, "elapsed": self.elapsed, "bytes": self.bytes}
+
+
+class StreamingSpeakClient(PooledSpeakClient):
+    """
+    PooledSpeakClient with streaming variants of `stream()` and `save()`.
+    """
+
+    def iter_stream(
+        self,
+        source: Dict,
+        options: Optional[Union[Dict, SpeakOptions]] = None,
+        addons: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        endpoint: str = "v1/speak",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> SpeakStream:
+        """
+        Same arguments as `SpeakClient.stream`; returns a SpeakStream that must
+        be entered (`with`) before iterating.
+        """
+        if not isinstance(source, dict) or "text" not in source:
+            raise DeepgramTypeError("Unknown speak source type")
+        if isinstance(options, SpeakOptions):
+            if not options.check():
+                raise DeepgramError("Fatal speak options error")
+            options = json.loads(options.to_json())
+        url = build_url(f"{self.config.url}/{endpoint}", options, addons)
+        return SpeakStream(
+            self.pool.client,
+            url,
+            build_headers(self.config.headers, headers),
+            source,
+            timeout if timeout is not None else self.pool.timeout,
+            chunk_size,
+        )
+
+    def save_stream(self, filename: str, source: Dict, options=None, **kwargs) -> SpeakStream:
+        """
+        Writes audio to `filename` as it arrives. Returns the finished
+        SpeakStream for its metadata and timings.
+        """
+        with self.iter_stream(source, options, **kwargs) as audio, open(filename, "wb") as f:
+            for chunk in audio:
+                f.write(chunk)
+        return audio
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Stream text-to-speech and report time to first byte")
+    parser.add_argument("text")
+    parser.add_argument("--out", default="speak.mp3")
+    parser.add_argument("--model", default="aura-asteria-en")
+    parser.add_argument("--deepgram-url", default=os.getenv("DEEPGRAM_URL", ""))
+    args = parser.parse_args()
+
+    deepgram = DeepgramClient(os.getenv("DEEPGRAM_API_KEY", ""), DeepgramClientOptions(url=args.deepgram_url))
+    with HTTPPool() as pool:
+        speak = StreamingSpeakClient(deepgram.config, pool)
+        audio = speak.save_stream(args.out, {"text": args.text}, SpeakOptions(model=args.model))
+    ms = {name: value * 1000 for name, value in audio.metrics().items() if name != "bytes" and value is not None}
+    print(
+        f"{audio.model_name}: {audio.bytes} bytes, headers {ms.get('headers', 0):.0f} ms, "
+        f"first byte {ms.get('ttfb', 0):.0f} ms, done {ms.get('elapsed', 0):.0f} ms -> {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
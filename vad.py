@@ -0,0 +1,236 @@
+"""
+Client-side voice activity gate between audio capture and `LiveClient.send`.
+
+While the shopper is listening the microphone still produces a frame every
+callback, and every one of them is uploaded and billed. VoiceGate sits in the
+push callback chain and only forwards audio around speech:
+
+    gate = VoiceGate(dg_connection.send)
+    microphone = Microphone(gate.push)
+
+Each frame is cut into short analysis windows. A window is voiced when its RMS
+energy clears an adaptive threshold (a multiple of the tracked noise floor) and
+its zero-crossing rate is below `max_zcr`, which rejects broadband hiss.
+Forwarding starts on the first voiced window, with up to `preroll_ms` of the
+audio before it, and stops `hangover_ms` after the last one. While suppressed
+the gate sends a `KeepAlive` every `keepalive_interval` seconds so Deepgram
+does not close the idle connection.
+
+Deepgram only finalizes (speech_final, UtteranceEnd) after it has received
+enough trailing silence, so `hangover_ms` should stay above the session's
+endpointing and `utterance_end_ms`. Suppressed audio is never sent, so
+transcript timestamps count forwarded audio only; `capture_offset()` maps them
+back to the position in the captured audio.
+"""
+
+import audioop
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from deepgram.audio.microphone import RATE
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = json.dumps({"type": "KeepAlive"})
+
+DEFAULT_WINDOW_MS = 20
+DEFAULT_HANGOVER_MS = 1500
+DEFAULT_PREROLL_MS = 300
+DEFAULT_MIN_ENERGY = 300
+DEFAULT_ENERGY_RATIO = 3.0
+DEFAULT_MAX_ZCR = 0.35
+DEFAULT_KEEPALIVE_INTERVAL = 5.0
+# weight of each unvoiced window in the noise floor average
+NOISE_ADAPT = 0.05
+
+
+class VoiceGate:
+    """
+    Forwards linear16 audio only around detected speech.
+
+    Args:
+        send: receives forwarded audio and KeepAlive strings, e.g.
+            `LiveClient.send`.
+        rate: sample rate of the audio.
+        channels: interleaved channels per frame; analysis uses all of them.
+        window_ms: analysis window length.
+        hangover_ms: audio still forwarded after the last voiced window.
+        preroll_ms: suppressed audio kept and sent ahead of a speech onset, so
+            the first syllable is not clipped.
+        min_energy: RMS below which a window is never voiced.
+        energy_ratio: a window is voiced when its RMS exceeds the noise floor
+            times this ratio (and `min_energy`).
+        max_zcr: zero crossings per sample above which a window is treated as
+            noise.
+        keepalive_interval: seconds between KeepAlive messages while
+            suppressing, 0 to disable.
+    """
+
+    sample_width = 2
+
+    def __init__(
+        self,
+        send: Callable[[Any], Any],
+        rate: int = RATE,
+        channels: int = 1,
+        window_ms: int = DEFAULT_WINDOW_MS,
+        hangover_ms: int = DEFAULT_HANGOVER_MS,
+        preroll_ms: int = DEFAULT_PREROLL_MS,
+        min_energy: int = DEFAULT_MIN_ENERGY,
+        energy_ratio: float = DEFAULT_ENERGY_RATIO,
+        max_zcr: float = DEFAULT_MAX_ZCR,
+        keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+    ):
+        self.send = send
+        self.rate = rate
+        self.channels = channels
+        self.window_bytes = max(1, rate * window_ms // 1000) * self.sample_width * channels
+        self.hangover = hangover_ms / 1000.0
+        self.preroll = preroll_ms / 1000.0
+        self.min_energy = min_energy
+        self.energy_ratio = energy_ratio
+        self.max_zcr = max_zcr
+        self.keepalive_interval = keepalive_interval
+        self.noise_floor = float(min_energy)
+
+        self._lock = threading.Lock()
+        self._preroll: deque = deque()
+        self._preroll_seconds = 0.0
+        # audio seconds left before an active gate closes
+        self._remaining = 0.0
+        self._last_keepalive = time.monotonic()
+        # where each forwarded stretch starts, in forwarded and captured seconds
+        self._forwarded_starts: list = []
+        self._captured_starts: list = []
+
+        self.frames = 0
+        self.suppressed = 0
+        self.seconds = 0.0
+        self.forwarded_seconds = 0.0
+        self.suppressed_seconds = 0.0
+        self.segments = 0
+        self.keepalives = 0
+
+    @property
+    def active(self) -> bool:
+        return self._remaining > 0
+
+    def push(self, data) -> None:
+        """
+        Push callback for a Microphone or audio_sources source.
+        """
+        duration = len(data) / (self.sample_width * self.channels * self.rate)
+        voiced = self.is_voiced(data)
+        preroll = []
+        with self._lock:
+            self.frames += 1
+            self.seconds += duration
+            if voiced:
+                if not self.active:
+                    self.segments += 1
+                    # the held pre-roll is contiguous with this frame
+                    self._mark(self.seconds - duration - self._preroll_seconds)
+                    preroll = self._take_preroll()
+                self._remaining = self.hangover + duration
+            if self.active:
+                self._remaining -= duration
+                self._last_keepalive = time.monotonic()
+                self.forwarded_seconds += duration
+                forward = True
+            else:
+                forward = False
+                self.suppressed += 1
+                self.suppressed_seconds += duration
+                self._hold(data, duration)
+                keepalive = self._keepalive_due()
+        # sent outside the lock, the held audio ahead of the onset frame
+        for held in preroll:
+            self.send(held)
+        if forward:
+            self.send(data)
+        elif keepalive:
+            self.send(KEEPALIVE)
+
+    __call__ = push
+
+    def is_voiced(self, data) -> bool:
+        """
+        True if any analysis window of `data` is voiced. Updates the noise
+        floor from the unvoiced windows.
+        """
+        voiced = False
+        view = memoryview(data)
+        samples = self.window_bytes // self.sample_width
+        for offset in range(0, len(view) - self.sample_width + 1, self.window_bytes):
+            window = view[offset : offset + self.window_bytes]
+            energy = audioop.rms(window, self.sample_width)
+            threshold = max(self.min_energy, self.noise_floor * self.energy_ratio)
+            if energy >= threshold:
+                zcr = audioop.cross(window, self.sample_width) / (len(window) // self.sample_width)
+                if zcr <= self.max_zcr:
+                    voiced = True
+                    continue
+            self.noise_floor += NOISE_ADAPT * (energy - self.noise_floor)
+        return voiced
+
+    def capture_offset(self, seconds: float) -> float:
+        """
+        Position in the captured audio of the audio sent `seconds` into the
+        forwarded stream, i.e. a Deepgram transcript time.
+        """
+        with self._lock:
+            index = bisect.bisect_right(self._forwarded_starts, seconds) - 1
+            if index < 0:
+                return seconds
+            return self._captured_starts[index] + seconds - self._forwarded_starts[index]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "suppressed": self.suppressed,
+                "suppressed_fraction": self.suppressed / self.frames if self.frames else 0.0,
+                "seconds": self.seconds,
+                "suppressed_seconds": self.suppressed_seconds,
+                "segments": self.segments,
+                "keepalives": self.keepalives,
+                "noise_floor": self.noise_floor,
+            }
+
+    def _hold(self, data, duration: float) -> None:
+        # frames may be reused buffers or mmap slices, keep a copy
+        self._preroll.append((bytes(data), duration))
+        self._preroll_seconds += duration
+        while self._preroll and self._preroll_seconds - self._preroll[0][1] >= self.preroll:
+            _, dropped = self._preroll.popleft()
+            self._preroll_seconds -= dropped
+
+    def _mark(self, captured: float) -> None:
+        self._forwarded_starts.append(self.forwarded_seconds)
+        self._captured_starts.append(captured)
+
+    def _take_preroll(self) -> List[bytes]:
+        held = []
+        while self._preroll:
+            data, duration = self._preroll.popleft()
+            self.suppressed -= 1
+            self.suppressed_seconds -= duration
+            self.forwarded_seconds += duration
+            held.append(data)
+        self._preroll_seconds = 0.0
+        return held
+
+    def _keepalive_due(self) -> bool:
+        if not self.keepalive_interval:
+            return False
+        now = time.monotonic()
+        if now - self._last_keepalive < self.keepalive_interval:
+            return False
+        self._last_keepalive = now
+        self.keepalives += 1
+        return True